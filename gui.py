@@ -8,14 +8,21 @@ import glob
 import sys
 import time
 from pathlib import Path
+import numpy as np
 
 # Import the build_item_database function
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 from build_item_database import build_item_database
 from overlay import PriceOverlay
+from item_store import ItemStore
+from item_filter import ItemFilter
+from virtual_table import VirtualTable
 from main import TarkovScanner
 
 ITEMS_DIR = os.path.join('data', 'items')
+ITEMS_FILE = os.path.join('data', 'items.json')
+# Price source dropdown label -> ItemFilter price array
+PRICE_SOURCES = {'Traders': 'trader', 'Flea Market': 'flea', 'Best Price': 'best'}
 
 class ItemDatabaseGUI(tk.Tk):
     def __init__(self):
@@ -41,8 +48,10 @@ class ItemDatabaseGUI(tk.Tk):
         self.configure(bg=self.tarkov_dark)
         self.setup_tarkov_theme()
         
-        self.items = []
-        self.filtered_items = []
+        self.items = ItemStore([])
+        self.item_filter = ItemFilter(self.items)
+        self.filtered_indices = np.empty(0, dtype=np.int32)
+        self.filtered_prices = np.empty(0, dtype=np.int64)
         self.images = {}
         self.categories = {}
         self.overlay = None
@@ -248,17 +257,18 @@ class ItemDatabaseGUI(tk.Tk):
         self.tree.column('Size', width=80, anchor='center')
         self.tree.column('Category', width=150, anchor='w')
         
-        # Add scrollbars
-        tree_scroll_y = ttk.Scrollbar(main_frame, orient='vertical', command=self.tree.yview)
+        # Add scrollbars. The vertical one scrolls the virtual table, not the tree itself.
+        tree_scroll_y = ttk.Scrollbar(main_frame, orient='vertical')
         tree_scroll_x = ttk.Scrollbar(main_frame, orient='horizontal', command=self.tree.xview)
-        self.tree.configure(yscrollcommand=tree_scroll_y.set, xscrollcommand=tree_scroll_x.set)
+        self.tree.configure(xscrollcommand=tree_scroll_x.set)
         
         # Grid the tree and scrollbars
         self.tree.grid(row=0, column=0, sticky='nsew', padx=5, pady=5)
         tree_scroll_y.grid(row=0, column=1, sticky='ns')
         tree_scroll_x.grid(row=1, column=0, sticky='ew')
         
-        self.tree.bind('<<TreeviewSelect>>', self.on_select)
+        # Only the visible rows exist in the tree; the table fills them from the filtered list
+        self.table = VirtualTable(self.tree, tree_scroll_y, on_select=self.on_select)
 
         # Bottom frame for details
         details_frame = tk.Frame(self, bg=self.tarkov_dark, relief='raised', bd=2)
@@ -411,7 +421,7 @@ class ItemDatabaseGUI(tk.Tk):
             current_files = set()
             current_mtime = 0
             
-            for json_file in glob.glob(os.path.join(ITEMS_DIR, '*.json')):
+            for json_file in glob.glob(os.path.join(ITEMS_DIR, '*.json')) + glob.glob(ITEMS_FILE):
                 current_files.add(json_file)
                 mtime = os.path.getmtime(json_file)
                 if mtime > current_mtime:
@@ -495,20 +505,31 @@ class ItemDatabaseGUI(tk.Tk):
         else:
             return 'Miscellaneous'
 
-    def load_items(self):
-        self.items = []
-        self.images = {}
-        self.categories = set()
+    def load_item_records(self):
+        """Reads the item database, falling back to per-item JSON files from older builds."""
+        if os.path.exists(ITEMS_FILE):
+            try:
+                with open(ITEMS_FILE, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f'Error loading {ITEMS_FILE}: {e}')
         
+        records = []
         for json_file in glob.glob(os.path.join(ITEMS_DIR, '*.json')):
             try:
                 with open(json_file, 'r', encoding='utf-8') as f:
-                    item = json.load(f)
-                    item['category'] = self.get_item_category(item['name'])
-                    self.categories.add(item['category'])
-                    self.items.append(item)
+                    records.append(json.load(f))
             except Exception as e:
                 print(f'Error loading {json_file}: {e}')
+        return records
+
+    def load_items(self):
+        self.images = {}
+        
+        # Items are kept column by column (see ItemStore); rows are views into it
+        self.items = ItemStore(self.load_item_records(), self.get_item_category)
+        self.item_filter = ItemFilter(self.items)
+        self.categories = set(self.items.categories.labels)
         
         # Update category dropdown
         categories = ['All Categories'] + sorted(list(self.categories))
@@ -528,99 +549,56 @@ class ItemDatabaseGUI(tk.Tk):
             max_price = None
         
         selected_category = self.category_var.get()
+        if selected_category == 'All Categories':
+            selected_category = None
         
-        self.filtered_items = []
-        for item in self.items:
-            name = item.get('name', '').lower()
-            category = item.get('category', '')
-            
-            # Fix: Handle None values for trader_price and avg_flea_price
-            trader_price = item.get('trader_price')
-            if trader_price is None:
-                trader_price = {}
-            price = trader_price.get('price', 0) or item.get('avg_flea_price', 0)
-            # Ensure price is a valid number
-            if price is None:
-                price = 0
-            price = int(price)
-            
-            # Apply filters
-            if search and search not in name:
-                continue
-            if min_price is not None and price < min_price:
-                continue
-            if max_price is not None and price > max_price:
-                continue
-            if selected_category != 'All Categories' and category != selected_category:
-                continue
-                
-            self.filtered_items.append(item)
+        # Array-based filtering; gives the indices of the matching items in the store
+        self.filtered_indices = self.item_filter.evaluate(search, min_price, max_price, selected_category)
         
         self.update_table()
 
     def update_table(self):
-        self.tree.delete(*self.tree.get_children())
+        # Prices for the whole filtered list in one array lookup
+        source = PRICE_SOURCES.get(self.price_source_var.get())
+        if source:
+            self.filtered_prices = self.item_filter.prices[source][self.filtered_indices]
+        else:
+            self.filtered_prices = np.zeros(len(self.filtered_indices), dtype=np.int64)
+        
+        # The table only asks for the rows it's showing
+        self.table.set_rows(len(self.filtered_indices), self.row_values)
+
+    def row_values(self, position):
+        """Column values for one row of the filtered list."""
+        index = int(self.filtered_indices[position])
+        name = self.items.names[index]
+        price = int(self.filtered_prices[position])
+        size = f'{self.items.grid_widths[index]}x{self.items.grid_heights[index]}'
+        
+        # Thumbnail indicator
+        thumbnail = '🖼️' if self.get_thumbnail(name) else '❌'
         
-        for item in self.filtered_items:
-            # Get or create thumbnail image
-            safe_name = ''.join(c if c.isalnum() or c in (' ', '-', '_') else '_' for c in item['name']).strip()
+        return (thumbnail, name, f'{price:,}', size, self.items.categories[index])
+
+    def get_thumbnail(self, item_name):
+        """Small (60x60) list thumbnail of an item, loaded on first use. None if there's no image."""
+        thumbnail_key = f"{item_name}_thumb"
+        if thumbnail_key not in self.images:
+            self.images[thumbnail_key] = None
+            safe_name = ''.join(c if c.isalnum() or c in (' ', '-', '_') else '_' for c in item_name).strip()
             img_path = os.path.join(ITEMS_DIR, f'{safe_name}.png')
-            
-            # Create thumbnail key
-            thumbnail_key = f"{item['name']}_thumb"
-            
-            if os.path.exists(img_path) and thumbnail_key not in self.images:
+            if os.path.exists(img_path):
                 try:
-                    # Create small thumbnail (60x60 for list)
                     img = Image.open(img_path).resize((60, 60), Image.Resampling.LANCZOS)
                     self.images[thumbnail_key] = ImageTk.PhotoImage(img)
                 except:
-                    self.images[thumbnail_key] = None
-            
-            # Get price based on selected source
-            price_source = self.price_source_var.get()
-            trader_price = item.get('trader_price', {})
-            flea_price = item.get('avg_flea_price', 0)
-            
-            if price_source == 'Traders':
-                price = trader_price.get('price', 0) if trader_price else 0
-            elif price_source == 'Flea Market':
-                price = flea_price if flea_price else 0
-            elif price_source == 'Best Price':
-                trader_val = trader_price.get('price', 0) if trader_price else 0
-                flea_val = flea_price if flea_price else 0
-                price = max(trader_val, flea_val)
-            else:
-                price = 0
-            
-            if price is None:
-                price = 0
-            price = int(price)
-            
-            # Get size
-            size = 'x'.join(str(x) for x in item.get('grid_size', [1,1]))
-            
-            # Insert item with thumbnail
-            item_id = self.tree.insert('', 'end', 
-                values=('', item['name'], f'{price:,}', size, item.get('category', '')))
-            
-            # Set thumbnail indicator
-            if thumbnail_key in self.images and self.images[thumbnail_key]:
-                self.tree.set(item_id, 'Thumbnail', '🖼️')
-            else:
-                self.tree.set(item_id, 'Thumbnail', '❌')
+                    pass
+        return self.images[thumbnail_key]
 
-    def on_select(self, event):
-        selected = self.tree.selection()
-        if not selected:
-            return
-        
-        item_id = selected[0]
-        item_name = self.tree.item(item_id)['values'][1]  # Name is in column 1 (Thumbnail, Name, Price, Size, Category)
-        item = next((i for i in self.filtered_items if i['name'] == item_name), None)
-        
-        if not item:
-            return
+    def on_select(self, position):
+        # The table reports a position in the filtered list
+        item = self.items.row(int(self.filtered_indices[position]))
+        item_name = item['name']
         
         # Load and display larger image
         safe_name = ''.join(c if c.isalnum() or c in (' ', '-', '_') else '_' for c in item_name).strip()
@@ -692,7 +670,7 @@ Flea Market Information:
 
 Raw Item Data:
 ═══════════════════════════════════════════════════════════════
-{json.dumps(item, indent=2, ensure_ascii=False)}"""
+{json.dumps(item.to_dict(), indent=2, ensure_ascii=False)}"""
         
         self.details_text.insert(tk.END, details)
         self.details_text.config(state='disabled')
@@ -784,5 +762,8 @@ Raw Item Data:
         return 'Unknown'
 
 if __name__ == '__main__':
+    # Needed for the scanner's recognition worker processes in the packaged .exe
+    import multiprocessing
+    multiprocessing.freeze_support()
     app = ItemDatabaseGUI()
     app.mainloop() 
\ No newline at end of file
@@ -1,16 +1,148 @@
 import os
 import sys
 import json
+import hashlib
+import struct
+from datetime import datetime
 import cv2
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
 
 # Ensure src is in the path for direct script execution
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-from src.tarkov_api import TarkovDevAPI
+from src.tarkov_api import TarkovDevAPI, best_trader_price
+from src.item_catalog import ItemCatalog
 
-def build_item_database_with_progress(progress_callback=None, min_value: int = 1):
+def make_template(image_path: str, template_path: str, width: int, height: int) -> bool:
+    """Turns a downloaded icon into a recognition template at its grid footprint."""
+    img = cv2.imread(image_path)
+    if img is None:
+        return False
+    # Keep the icon at its grid footprint so big items are not squashed into one slot
+    img_resized = cv2.resize(img, (63 * width, 63 * height))
+    return cv2.imwrite(template_path, img_resized)
+
+def template_is_current(template_path: str, width: int, height: int) -> bool:
+    """
+    Checks that a template exists and is at the item's grid footprint, so ones
+    from older builds (a single 63x63 slot) get rebuilt.
+    Only the PNG header is read, which keeps this cheap enough to run for every item.
+    """
+    try:
+        with open(template_path, 'rb') as f:
+            header = f.read(24)
+    except OSError:
+        return False
+    if len(header) < 24 or header[:8] != b'\x89PNG\r\n\x1a\n':
+        return False
+    # The IHDR chunk comes first: big-endian width and height after its type
+    png_width, png_height = struct.unpack('>II', header[16:24])
+    return (png_width, png_height) == (63 * width, 63 * height)
+
+def refresh_template(image_path: str, template_path: str, width: int, height: int, rebuild: bool) -> bool:
+    """
+    Rebuilds a template if asked to, or if the existing one is missing or the
+    wrong size. Returns True if a template was written.
+    """
+    if not rebuild and template_is_current(template_path, width, height):
+        return False
+    return make_template(image_path, template_path, width, height)
+
+def create_templates(api: TarkovDevAPI, jobs: List[Tuple[Dict, str, str, bool, bool]],
+                     progress_callback: Optional[Callable] = None,
+                     progress_range: Tuple[float, float] = (35, 95), workers: int = 4) -> int:
+    """
+    Downloads the icons for (item, image URL, template path, revalidate, force) jobs
+    and turns them into templates.
+    With revalidate, a cached icon is checked with a conditional request and
+    its template is only rewritten if the icon actually changed, force is set,
+    or the template is missing or the wrong size; the new file time then
+    invalidates the compiled template pack.
+    All downloads are in flight at once on the API's event loop (its connection
+    pool and rate limiter keep them in check), and every finished download is
+    resized and written on a small thread pool while the rest keep coming in.
+    Progress is reported from the calling thread. Returns the number of templates created.
+    """
+    if not jobs:
+        return 0
+        
+    start, end = progress_range
+    downloads = {
+        api.submit(api.async_api.fetch_item_image(item['name'], image_url, revalidate)): (item, template_path, force)
+        for item, image_url, template_path, revalidate, force in jobs
+    }
+    
+    created = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        processing = []
+        for done, future in enumerate(as_completed(downloads), 1):
+            item, template_path, force = downloads[future]
+            image_path, changed = future.result()
+            if image_path:
+                processing.append(pool.submit(
+                    refresh_template, image_path, template_path,
+                    item['width'], item['height'], changed or force
+                ))
+                
+            if progress_callback:
+                progress = start + (done / len(jobs)) * (end - start)
+                progress_callback(progress, f"Downloaded {item['name']} ({done}/{len(jobs)})")
+                
+        for future in processing:
+            if future.result():
+                created += 1
+                
+    return created
+
+def item_source_hash(item: Dict) -> str:
+    """
+    Hash of the static fields (name, size, icon) a database record and its
+    template are built from. If it matches the previous build, the item's
+    icon and template don't need reprocessing. Prices are compared separately,
+    so a price move never costs an image request.
+    """
+    fields = {
+        'name': item.get('name'),
+        'shortName': item.get('shortName'),
+        'width': item.get('width'),
+        'height': item.get('height'),
+        'image': item.get('gridImageLink') or item.get('iconLink')
+    }
+    return hashlib.sha1(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()
+
+def record_price_change(changes: Dict, name: str, previous: Dict, trader_price: Dict):
+    """Adds a price move (or a change of trader) to the build's change log."""
+    old_price = previous['trader_price']['price']
+    changes['price_changes'].append({'name': name, 'old': old_price, 'new': trader_price['price']})
+    print(f"Price of {name} moved from {old_price} to {trader_price['price']}")
+
+def load_previous_items(items_path: str) -> List[Dict]:
+    """Reads the items.json of the last build, or an empty list if there is none."""
+    if not os.path.exists(items_path):
+        return []
+    try:
+        with open(items_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error reading previous item database {items_path}: {e}")
+        return []
+
+def build_item_database_with_progress(progress_callback=None, min_value: int = 1, refresh_images: bool = False,
+                                      max_removed_fraction: float = 0.5):
     """
     Builds a local database of valuable items for the scanner with progress updates.
     This downloads images and creates recognition templates.
+    
+    The build is incremental: items are compared with the last build by id and
+    a hash of their static fields, and only new or changed items are
+    reprocessed. Returns the change log (added, removed, changed, price_changes).
+    With refresh_images every icon is revalidated with the server, so updated
+    icons are picked up without clearing the cache.
+    
+    The existing database is left alone (and None returned) if the API gives
+    back no items, or if the new catalog would remove more than
+    max_removed_fraction of the previous one; that's a failed or partial
+    fetch, not the game removing half its items.
     """
     if progress_callback:
         progress_callback(0, "Initializing API...")
@@ -23,6 +155,13 @@ def build_item_database_with_progress(progress_callback=None, min_value: int = 1
     
     # Fetch all items
     items = api.fetch_all_items()
+    if not items:
+        # fetch_all_items returns [] when the request failed
+        print("No items fetched from the API, keeping the existing item database")
+        api.close()
+        if progress_callback:
+            progress_callback(100, "Could not fetch items, kept the existing database")
+        return None
     
     if progress_callback:
         progress_callback(15, f"Processing {len(items)} items...")
@@ -48,7 +187,8 @@ def build_item_database_with_progress(progress_callback=None, min_value: int = 1
             'name': item['name'],
             'price': best_price,
             'width': item['width'],
-            'height': item['height']
+            'height': item['height'],
+            'item': item
         })
     
     # Sort by value
@@ -63,64 +203,131 @@ def build_item_database_with_progress(progress_callback=None, min_value: int = 1
     # Also ensure cache/data exists for API
     os.makedirs("data/cache/data", exist_ok=True)
     
-    # Check for existing items to avoid re-downloading images
-    existing_items = set()
-    if os.path.exists(templates_dir):
-        for json_file in os.listdir(templates_dir):
-            if json_file.endswith('.json'):
-                item_name = json_file[:-5]  # Remove .json extension
-                existing_items.add(item_name)
-    
-    new_items = 0
-    existing_items_updated = 0
-    
     if progress_callback:
-        progress_callback(30, f"Checking {len(existing_items)} existing items...")
+        progress_callback(30, f"Comparing {len(items_to_process)} items with the last build...")
+    
+    # The last build; items whose id and source fields match it are reused as they are
+    items_path = os.path.join('data', 'items.json')
+    previous_items = load_previous_items(items_path)
+    previous_catalog = ItemCatalog(previous_items)
     
+    changes = {'added': [], 'removed': [], 'changed': [], 'price_changes': []}
     all_items = []
+    template_jobs = []
+    seen_ids = set()
+    seen_names = set()
     for i, item_info in enumerate(items_to_process):  # Process all items
-        if progress_callback:
-            progress = 30 + (i / len(items_to_process)) * 65  # 30% to 95%
+        if progress_callback and i % 100 == 0:
+            progress = 30 + (i / len(items_to_process)) * 5  # 30% to 35%
             progress_callback(progress, f"Processing {item_info['name']} ({i+1}/{len(items_to_process)})")
         
-        item = api.get_item_by_name(item_info['name'])
-        if not item:
+        item = item_info['item']
+        seen_ids.add(item['id'])
+        seen_names.add(item['name'])
+        source_hash = item_source_hash(item)
+        previous = previous_catalog.get_by_id(item['id']) or previous_catalog.get_by_name(item['name'])
+        image_url = item.get('gridImageLink') or item.get('iconLink')
+        
+        trader_price = best_trader_price(item)
+        if trader_price is None:
+            trader_price = {"price": 0, "trader": "None", "currency": "RUB"}
+        
+        if previous and previous.get('source_hash') == source_hash:
+            # Name, size and icon are unchanged, so the template is still good
+            # unless it went missing or is from before grid footprints
+            template_path = os.path.join(templates_dir, previous['image_filename'])
+            if image_url and (refresh_images or not template_is_current(template_path, item['width'], item['height'])):
+                template_jobs.append((item, image_url, template_path, refresh_images, False))
+            
+            if previous['trader_price'] == trader_price:
+                # Nothing about this item changed since the last build
+                all_items.append(previous)
+            else:
+                all_items.append(dict(previous, trader_price=trader_price))
+                record_price_change(changes, item['name'], previous, trader_price)
             continue
+        
         # Sanitize the item name for filenames
         safe_name = ''.join(c if c.isalnum() or c in (' ', '-', '_') else '_' for c in item['name']).strip()
         
         template_path = os.path.join(templates_dir, f"{safe_name}.png")
         image_filename = f"{safe_name}.png"
         
-        # Only download/process image if it doesn't exist
-        if not os.path.exists(template_path):
-            image_url = item.get('gridImageLink') or item.get('iconLink')
-            if image_url:
-                image_path = api.download_item_image(item['name'], image_url)
-                if image_path and os.path.exists(image_path):
-                    img = cv2.imread(image_path)
-                    if img is not None:
-                        img_resized = cv2.resize(img, (63, 63))
-                        cv2.imwrite(template_path, img_resized)
-        
-        trader_price = api.get_best_trader_price(item['name'])
-        if trader_price is None:
-            trader_price = {"price": 0, "trader": "None", "currency": "RUB"}
+        # New or changed items get their icon checked (done concurrently below).
+        # Records from before source hashes existed get their template rebuilt
+        # even if the icon is unchanged, since it may predate grid footprints
+        if image_url:
+            rebuild = previous is not None and not previous.get('source_hash')
+            template_jobs.append((item, image_url, template_path, previous is not None or refresh_images, rebuild))
         
         all_items.append({
+            'id': item['id'],
             'name': item['name'],
             'short_name': item.get('shortName', ''),
             'trader_price': trader_price,
             'avg_flea_price': 0,  # Flea market disabled this wipe
             'grid_size': [item['width'], item['height']],
-            'image_filename': image_filename
+            'image_filename': image_filename,
+            'source_hash': source_hash
         })
-        print(f"Added {item['name']} with price {trader_price['price']}")
+        
+        if previous is None:
+            changes['added'].append(item['name'])
+            print(f"Added {item['name']} with price {trader_price['price']}")
+            continue
+        if previous.get('source_hash'):
+            changes['changed'].append(item['name'])
+            print(f"Updated {item['name']}")
+        if previous['trader_price'] != trader_price:
+            record_price_change(changes, item['name'], previous, trader_price)
+    
+    # Items that are gone from the catalog
+    removed = [record for record in previous_items
+               if record.get('id') not in seen_ids and record['name'] not in seen_names]
+    if previous_items and len(removed) > max_removed_fraction * len(previous_items):
+        print(f"The API returned {len(items)} items and {len(removed)} of the {len(previous_items)} known items "
+              f"are missing; looks like an incomplete fetch, keeping the existing item database")
+        api.close()
+        if progress_callback:
+            progress_callback(100, "Incomplete item list from the API, kept the existing database")
+        return None
+    
+    # Remove them, and their templates if no other item uses them
+    in_use = {record['image_filename'] for record in all_items}
+    for record in removed:
+        changes['removed'].append(record['name'])
+        print(f"Removed {record['name']}")
+        template_path = os.path.join(templates_dir, record['image_filename'])
+        if record['image_filename'] not in in_use and os.path.exists(template_path):
+            os.remove(template_path)
+    
+    if progress_callback:
+        progress_callback(35, f"Checking {len(template_jobs)} item images...")
+    
+    created = create_templates(api, template_jobs, progress_callback)
+    print(f"Created or updated {created} templates")
+    api.close()
+    
+    # Leave items.json untouched if nothing changed, so its file time (and
+    # with it the compiled template pack) stays valid
+    if all_items == previous_items:
+        print("Item database is up to date")
+        if progress_callback:
+            progress_callback(100, "Item database is up to date")
+        return changes
     
     # Write all items to a single items.json file
-    with open(os.path.join('data', 'items.json'), 'w', encoding='utf-8') as f:
+    with open(items_path, 'w', encoding='utf-8') as f:
         json.dump(all_items, f, indent=2, ensure_ascii=False)
     print(f"Wrote {len(all_items)} items to data/items.json")
+    
+    # Keep a change log of this build next to it
+    if any(changes.values()):
+        with open(os.path.join('data', 'items_changes.json'), 'w', encoding='utf-8') as f:
+            json.dump(dict(changes, timestamp=datetime.now().isoformat()), f, indent=2, ensure_ascii=False)
+        print(f"{len(changes['added'])} new, {len(changes['removed'])} removed, "
+              f"{len(changes['price_changes'])} price changes, {len(changes['changed'])} other changes")
+    return changes
 
 def build_item_database(min_value: int = 1):
     """
@@ -242,7 +449,8 @@ def build_item_database(min_value: int = 1):
                     # Load and process the image
                     img = cv2.imread(image_path)
                     if img is not None:
-                        img_resized = cv2.resize(img, (63, 63))
+                        # Keep the icon at its grid footprint so big items are not squashed into one slot
+                        img_resized = cv2.resize(img, (63 * item['width'], 63 * item['height']))
                         cv2.imwrite(template_path, img_resized)
                         # Create JSON data file
                         trader_price = api.get_best_trader_price(item['name'])
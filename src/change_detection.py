@@ -0,0 +1,119 @@
+import cv2
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+class SlotChangeTracker:
+    """
+    Remembers a cheap fingerprint of every inventory slot together with
+    the item it was recognized as, so unchanged slots are never
+    recognized twice.
+    """
+
+    def __init__(self):
+        # (row, col) -> (fingerprint, item name or None)
+        self.entries: Dict[Tuple[int, int], Tuple[bytes, Optional[str]]] = {}
+        self.stats = {'reused': 0, 'recognized': 0}
+
+    @staticmethod
+    def fingerprint(slot: dict) -> bytes:
+        """
+        A 16x16 thumbnail of the slot, quantized so tiny rendering noise
+        doesn't count as a change, plus the slot's footprint.
+        """
+        thumb = cv2.resize(slot['image'], (16, 16), interpolation=cv2.INTER_AREA)
+        footprint = slot.get('footprint', (1, 1))
+        return bytes(footprint) + (thumb >> 3).tobytes()
+
+    def find_changed(self, slots: List[dict]) -> List[dict]:
+        """
+        Returns the slots whose fingerprint differs from the last scan.
+        Positions that are no longer occupied are forgotten.
+        """
+        changed = []
+        seen = set()
+        for slot in slots:
+            position = slot['position']
+            seen.add(position)
+
+            slot['fingerprint'] = self.fingerprint(slot)
+            entry = self.entries.get(position)
+            if entry is None or entry[0] != slot['fingerprint']:
+                changed.append(slot)
+
+        for position in list(self.entries):
+            if position not in seen:
+                del self.entries[position]
+
+        self.stats['recognized'] += len(changed)
+        self.stats['reused'] += len(slots) - len(changed)
+        return changed
+
+    def remember(self, slots: List[dict], item_names: List[Optional[str]]):
+        """Stores the recognition results for freshly recognized slots."""
+        for slot, item_name in zip(slots, item_names):
+            self.entries[slot['position']] = (slot['fingerprint'], item_name)
+
+    def get_result(self, slot: dict) -> Optional[str]:
+        """Returns the last recognition result for a slot's position."""
+        entry = self.entries.get(slot['position'])
+        return entry[1] if entry else None
+
+    def reset(self):
+        """Forgets everything, e.g. when the inventory is closed."""
+        self.entries = {}
+
+class FrameChangeGate:
+    """
+    Decides whether a new screenshot differs enough from the last processed
+    one to be worth running the rest of the pipeline on.
+
+    The frame is split into small blocks and the largest block difference
+    decides, so a single item moving in a big grid counts as much as a
+    change across the whole screen.
+    """
+
+    def __init__(self, threshold: float = 8.0, block: int = 32, step: int = 4):
+        # Mean absolute difference (0-255) inside the most changed block below
+        # which a frame counts as unchanged
+        self.threshold = threshold
+        # Block size in screen pixels; about half a 63px slot, so a slot
+        # always covers at least one whole block however it's aligned
+        self.block = block
+        # Only every step-th pixel is compared, to keep 4K frames cheap
+        self.step = step
+        self.previous: Optional[np.ndarray] = None
+        self.last_difference = 0.0
+        self.stats = {'processed': 0, 'skipped': 0}
+
+    def difference(self, small: np.ndarray) -> float:
+        """Mean absolute difference of the most changed block."""
+        diff = cv2.absdiff(small, self.previous)
+        # INTER_AREA averages each block of sampled pixels (per channel)
+        samples = max(1, self.block // self.step)
+        blocks = (max(1, diff.shape[1] // samples), max(1, diff.shape[0] // samples))
+        return float(cv2.resize(diff, blocks, interpolation=cv2.INTER_AREA).max())
+
+    def has_changed(self, screenshot: np.ndarray) -> bool:
+        """
+        Returns True if the frame should be processed, False if it can be skipped.
+        Frames are compared with the last *processed* frame, so slow drift
+        still adds up and eventually gets through.
+        """
+        # Nearest-neighbour shrinking is a much faster way to sample every step-th pixel
+        height, width = screenshot.shape[:2]
+        small = cv2.resize(screenshot, (max(1, width // self.step), max(1, height // self.step)),
+                           interpolation=cv2.INTER_NEAREST)
+
+        if self.previous is not None and self.previous.shape == small.shape:
+            self.last_difference = self.difference(small)
+            if self.last_difference < self.threshold:
+                self.stats['skipped'] += 1
+                return False
+
+        self.previous = small
+        self.stats['processed'] += 1
+        return True
+
+    def reset(self):
+        """Forgets the previous frame so the next one is always processed."""
+        self.previous = None
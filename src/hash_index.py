@@ -0,0 +1,126 @@
+import cv2
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+# Hash functions understood by PerceptualHashIndex
+HASH_METHODS = ('dhash', 'phash')
+
+def dhash(image: np.ndarray) -> int:
+    """
+    Difference hash: shrinks the image to 9x8 grayscale and records whether
+    each pixel is brighter than its right-hand neighbour. 64 bits.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return _pack_bits(bits)
+
+def phash(image: np.ndarray) -> int:
+    """
+    Perceptual hash: the low-frequency 8x8 corner of the DCT of a 32x32
+    grayscale thumbnail, thresholded at its median. 64 bits.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].ravel()
+    bits = low > np.median(low)
+    return _pack_bits(bits)
+
+def _pack_bits(bits: np.ndarray) -> int:
+    """Packs a boolean array into a single integer."""
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of bits that differ between two hashes."""
+    return bin(a ^ b).count('1')
+
+class BKTree:
+    """
+    A Burkhard-Keller tree over Hamming distance.
+    Finds every hash within a given distance without comparing against all of them.
+    """
+
+    def __init__(self):
+        # Each node is [hash, values, {distance: child}]
+        self.root = None
+        self.size = 0
+
+    def add(self, hash_value: int, value):
+        """Adds a value under the given hash."""
+        self.size += 1
+        if self.root is None:
+            self.root = [hash_value, [value], {}]
+            return
+
+        node = self.root
+        while True:
+            distance = hamming_distance(hash_value, node[0])
+            if distance == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [hash_value, [value], {}]
+                return
+            node = child
+
+    def search(self, hash_value: int, max_distance: int) -> List[Tuple[int, object]]:
+        """
+        Returns (distance, value) for every value within max_distance of the hash.
+        """
+        results = []
+        if self.root is None:
+            return results
+
+        pending = [self.root]
+        while pending:
+            node = pending.pop()
+            distance = hamming_distance(hash_value, node[0])
+            if distance <= max_distance:
+                results.extend((distance, value) for value in node[1])
+
+            # Triangle inequality: only children in this band can be close enough
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    pending.append(child)
+
+        return results
+
+class PerceptualHashIndex:
+    """
+    Resolves clean, unobstructed item icons by perceptual hash alone,
+    so they never need a full template match.
+    """
+
+    def __init__(self, method: str = 'dhash', max_distance: int = 4):
+        if method not in HASH_METHODS:
+            raise ValueError(f"Unknown hash method '{method}', expected one of {HASH_METHODS}")
+        self.method = method
+        self.hash_function = dhash if method == 'dhash' else phash
+        self.max_distance = max_distance
+        self.names: List[str] = []
+        self.hashes: List[int] = []
+        self.tree = BKTree()
+
+    def build(self, templates: Dict[str, np.ndarray]):
+        """Hashes every template into a fresh tree."""
+        names = list(templates.keys())
+        self.build_from_hashes(names, [self.hash_function(templates[name]) for name in names])
+
+    def build_from_hashes(self, names: List[str], hashes: List[int]):
+        """Fills a fresh tree from precomputed hashes, e.g. from a template pack."""
+        self.names = list(names)
+        self.hashes = [int(h) for h in hashes]
+        self.tree = BKTree()
+        for name, hash_value in zip(self.names, self.hashes):
+            self.tree.add(hash_value, name)
+
+    def lookup(self, image: np.ndarray) -> Optional[str]:
+        """
+        Returns the item name if exactly one item hashes within max_distance
+        of the image, or None if there are no matches or several (ambiguous).
+        """
+        matches = {name for _, name in self.tree.search(self.hash_function(image), self.max_distance)}
+        if len(matches) == 1:
+            return matches.pop()
+        return None
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+class ImageMetadataStore:
+    """
+    Remembers where every cached item image came from (URL), the validators
+    the server sent with it (ETag / Last-Modified) and a hash of its content,
+    so refreshes can ask "has this changed?" instead of downloading again.
+    """
+
+    def __init__(self, index_path: str = "data/cache/images/index.json"):
+        self.index_path = index_path
+        # image path -> {'url', 'etag', 'last_modified', 'sha256'}
+        self.entries: Dict[str, Dict] = {}
+        self.dirty = False
+        self.load()
+
+    @staticmethod
+    def content_hash(content: bytes) -> str:
+        """SHA-256 of an image's bytes."""
+        return hashlib.sha256(content).hexdigest()
+
+    @classmethod
+    def file_hash(cls, path: str) -> Optional[str]:
+        """SHA-256 of a file on disk, or None if it doesn't exist."""
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return cls.content_hash(f.read())
+
+    def load(self):
+        """Reads the index from disk, starting empty if it's missing or broken."""
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except Exception as e:
+            print(f"Error loading image metadata {self.index_path}: {e}")
+            self.entries = {}
+
+    def save(self):
+        """Writes the index back to disk if anything changed."""
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+        with open(self.index_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2, ensure_ascii=False)
+        os.replace(self.index_path + '.tmp', self.index_path)
+        self.dirty = False
+
+    def get(self, image_path: str, image_url: str) -> Optional[Dict]:
+        """
+        Returns the metadata for a cached image, or None if we don't have the
+        file or it was downloaded from a different URL.
+        """
+        entry = self.entries.get(image_path)
+        if entry is None or entry.get('url') != image_url or not os.path.exists(image_path):
+            return None
+        return entry
+
+    def conditional_headers(self, image_path: str, image_url: str) -> Dict[str, str]:
+        """Headers that let the server answer 304 Not Modified if the image is unchanged."""
+        entry = self.get(image_path, image_url)
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def update(self, image_path: str, image_url: str, etag: Optional[str],
+               last_modified: Optional[str], sha256: str):
+        """Records the metadata of a freshly downloaded image."""
+        self.entries[image_path] = {
+            'url': image_url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'sha256': sha256
+        }
+        self.dirty = True
@@ -2,6 +2,14 @@ import cv2
 import numpy as np
 from typing import List, Tuple, Optional
 
+def to_gray(image: np.ndarray, dst: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Converts a BGR or BGRA (straight from the screen capture) image to grayscale,
+    optionally into an existing buffer.
+    """
+    code = cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+    return cv2.cvtColor(image, code, dst=dst)
+
 class InventoryDetector:
     """Detects and extracts the inventory grid from screenshots."""
     
@@ -16,20 +24,117 @@ class InventoryDetector:
             'upper': np.array([80, 80, 80])
         }
         
-    def find_inventory_region(self, screenshot: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        # How a grid line between two cells looks: a uniform strip that
+        # contrasts with both neighbours. Used to tell multi-cell items apart.
+        self.grid_line_max_std = 12
+        self.grid_line_min_contrast = 8
+        
+        # Once found, the inventory hardly ever moves. We remember where it was
+        # and what its grid lines looked like, and only fall back to the full
+        # contour search when that no longer matches.
+        self.tracked_region = None
+        self.grid_signature = None
+        self.grid_line_tolerance = 10   # max brightness change of a grid line
+        self.grid_match_ratio = 0.8     # share of grid lines that must still match
+        self.tracking_stats = {'tracked': 0, 'searched': 0}
+        
+        # Scratch buffers (grayscale copies, threshold masks, ...) reused
+        # between scans instead of being allocated every frame
+        self.scratch = {}
+        
+    def find_inventory_region(self, screenshot: np.ndarray,
+                              origin: Tuple[int, int] = (0, 0)) -> Optional[Tuple[int, int, int, int]]:
         """
         Finds the inventory area in the screenshot.
+        Checks the last known region first and only searches the whole
+        frame if the grid isn't there anymore.
+        `origin` is where the screenshot's top-left corner sits in the game
+        window, for screenshots that only cover part of it (ROI captures).
+        Returns (x, y, width, height) in game window coordinates or None if not found.
+        """
+        if self.tracked_region and self.validate_region(screenshot, self.to_local(self.tracked_region, origin)):
+            self.tracking_stats['tracked'] += 1
+            return self.tracked_region
+        
+        self.tracking_stats['searched'] += 1
+        region = self.search_inventory_region(screenshot)
+        
+        self.tracked_region = None
+        self.grid_signature = None
+        if region:
+            self.grid_signature = self.compute_grid_signature(screenshot, region)
+            self.tracked_region = (region[0] + origin[0], region[1] + origin[1], region[2], region[3])
+        return self.tracked_region
+    
+    def scratch_buffer(self, name: str, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        """Returns a reusable scratch buffer, reallocating only if the shape changed."""
+        buffer = self.scratch.get(name)
+        if buffer is None or buffer.shape != tuple(shape) or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype=dtype)
+            self.scratch[name] = buffer
+        return buffer
+    
+    @staticmethod
+    def to_local(region: Tuple[int, int, int, int], origin: Tuple[int, int]) -> Tuple[int, int, int, int]:
+        """Converts a game window region into coordinates inside a screenshot starting at `origin`."""
+        x, y, w, h = region
+        return (x - origin[0], y - origin[1], w, h)
+    
+    def compute_grid_signature(self, screenshot: np.ndarray,
+                               region: Tuple[int, int, int, int]) -> Optional[np.ndarray]:
+        """
+        Measures the mean brightness along every grid line of the region.
+        Only the region itself is converted to grayscale.
+        """
+        x, y, w, h = region
+        cols = w // self.slot_size[0]
+        rows = h // self.slot_size[1]
+        if cols < 2 or rows < 2 or x < 0 or y < 0:
+            return None
+        
+        roi = screenshot[y:y + rows * self.slot_size[1], x:x + cols * self.slot_size[0]]
+        if roi.shape[0] < rows * self.slot_size[1] or roi.shape[1] < cols * self.slot_size[0]:
+            return None
+        gray = to_gray(roi, dst=self.scratch_buffer('region_gray', roi.shape[:2]))
+        
+        # Each line is the two pixel strip around a cell boundary
+        vertical = [gray[:, c * self.slot_size[0] - 1:c * self.slot_size[0] + 1].mean()
+                    for c in range(1, cols)]
+        horizontal = [gray[r * self.slot_size[1] - 1:r * self.slot_size[1] + 1, :].mean()
+                      for r in range(1, rows)]
+        return np.array(vertical + horizontal, dtype=np.float32)
+    
+    def validate_region(self, screenshot: np.ndarray, region: Tuple[int, int, int, int]) -> bool:
+        """
+        Cheap check that the inventory grid is still at the given region.
+        Items moving around only change a few grid lines, so we allow some
+        lines to differ before giving up on the region.
+        """
+        if self.grid_signature is None:
+            return False
+            
+        signature = self.compute_grid_signature(screenshot, region)
+        if signature is None or signature.shape != self.grid_signature.shape:
+            return False
+            
+        matching = np.abs(signature - self.grid_signature) <= self.grid_line_tolerance
+        return matching.mean() >= self.grid_match_ratio
+    
+    def search_inventory_region(self, screenshot: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Searches the whole screenshot for the inventory area.
         Returns (x, y, width, height) or None if not found.
         """
         # Convert to grayscale for easier processing
-        gray = cv2.cvtColor(screenshot, cv2.COLOR_BGR2GRAY)
+        gray = to_gray(screenshot, dst=self.scratch_buffer('gray', screenshot.shape[:2]))
         
         # Look for the characteristic pattern of the inventory grid
         # This is simplified - in reality, you'd use template matching
         # with an image of the inventory border
         
         # Apply threshold to find dark regions (inventory background)
-        _, thresh = cv2.threshold(gray, 50, 255, cv2.THRESH_BINARY_INV)
+        thresh = self.scratch_buffer('thresh', gray.shape)
+        cv2.threshold(gray, 50, 255, cv2.THRESH_BINARY_INV, dst=thresh)
         
         # Find contours (connected regions)
         contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -49,59 +154,177 @@ class InventoryDetector:
         
         return None
     
+    def extract_slot_grid(self, screenshot: np.ndarray,
+                          inventory_region: Tuple[int, int, int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Splits the inventory region into cells without copying any pixels.
+        Returns a (rows, cols, slot_h, slot_w, channels) strided view of the
+        screenshot and a (rows, cols) boolean mask of occupied cells.
+        """
+        x, y, w, h = inventory_region
+        sw, sh = self.slot_size
+        
+        # Calculate how many slots fit in the inventory
+        cols = w // sw
+        rows = h // sh
+        
+        # Only the color channels matter; slicing off alpha is free
+        region = screenshot[y:y + rows * sh, x:x + cols * sw, :3]
+        rows = min(rows, region.shape[0] // sh)
+        cols = min(cols, region.shape[1] // sw)
+        
+        # Every cell is just a different window onto the same memory
+        row_stride, col_stride, channel_stride = region.strides
+        cells = np.lib.stride_tricks.as_strided(
+            region,
+            shape=(rows, cols, sh, sw, region.shape[2]),
+            strides=(row_stride * sh, col_stride * sw, row_stride, col_stride, channel_stride),
+            writeable=False
+        )
+        
+        return cells, ~self.empty_cell_mask(cells)
+    
+    def empty_cell_mask(self, cells: np.ndarray) -> np.ndarray:
+        """
+        Classifies every cell of the grid at once.
+        Empty slots are uniform gray: every channel's mean is gray
+        and its variance is low.
+        """
+        if cells.size == 0:
+            return np.zeros(cells.shape[:2], dtype=bool)
+            
+        # Mean and variance from per-cell sums, so no float copy of the
+        # whole grid is ever made: var = E[x^2] - E[x]^2
+        pixels = cells.shape[2] * cells.shape[3]
+        sums = cells.sum(axis=(2, 3), dtype=np.uint64)
+        squares = np.einsum('rcyxk,rcyxk->rck', cells, cells, dtype=np.uint64, casting='unsafe')
+        avg_color = sums / pixels
+        color_variance = squares / pixels - avg_color ** 2
+        
+        is_gray = np.all((avg_color > 40) & (avg_color < 80), axis=2)
+        is_uniform = np.all(color_variance < 100, axis=2)
+        
+        return is_gray & is_uniform
+    
     def extract_inventory_slots(self, screenshot: np.ndarray, 
-                              inventory_region: Tuple[int, int, int, int]) -> List[dict]:
+                              inventory_region: Tuple[int, int, int, int],
+                              origin: Tuple[int, int] = (0, 0)) -> List[dict]:
         """
-        Extracts individual inventory slots from the inventory region.
+        Extracts the occupied inventory slots from the inventory region.
+        Items covering several cells are returned once, with their footprint
+        and an image of the whole area they cover. Empty cells are skipped.
+        The region and the returned coordinates are in game window
+        coordinates; `origin` is where the screenshot starts in the window.
         Returns a list of slot information including position and image.
         """
-        x, y, w, h = inventory_region
+        local_region = self.to_local(inventory_region, origin)
+        x, y, _, _ = local_region
         slots = []
         
-        # Calculate how many slots fit in the inventory
-        cols = w // self.slot_size[0]
-        rows = h // self.slot_size[1]
+        # Classify every cell first so we can group cells into items
+        cells, occupied = self.extract_slot_grid(screenshot, local_region)
+        rows, cols = occupied.shape
         
         print(f"Extracting {rows}x{cols} grid of slots")
         
-        for row in range(rows):
-            for col in range(cols):
-                # Calculate this slot's position
-                slot_x = x + (col * self.slot_size[0])
-                slot_y = y + (row * self.slot_size[1])
-                
-                # Extract the slot image
-                slot_image = screenshot[
-                    slot_y:slot_y + self.slot_size[1],
-                    slot_x:slot_x + self.slot_size[0]
-                ]
-                
-                # Store slot information
-                slot_info = {
-                    'position': (row, col),
-                    'coordinates': (slot_x, slot_y),
-                    'image': slot_image,
-                    'is_empty': self.is_slot_empty(slot_image)
-                }
+        if not occupied.any():
+            return slots
+        
+        region = screenshot[y:y + rows * self.slot_size[1], x:x + cols * self.slot_size[0]]
+        gray = to_gray(region, dst=self.scratch_buffer('region_gray', region.shape[:2]))
+        covered = np.zeros_like(occupied)
+        
+        # Occupied cells in row-major order, so each item is found at its top-left cell
+        for row, col in zip(*np.nonzero(occupied)):
+            row, col = int(row), int(col)
+            if covered[row, col]:
+                continue
                 
-                slots.append(slot_info)
+            footprint = self.find_item_footprint(gray, occupied, covered, row, col)
+            covered[row:row + footprint[1], col:col + footprint[0]] = True
+            
+            # Calculate this slot's position
+            slot_x = x + (col * self.slot_size[0])
+            slot_y = y + (row * self.slot_size[1])
+            
+            # Extract the image of everything the item covers
+            slot_image = screenshot[
+                slot_y:slot_y + footprint[1] * self.slot_size[1],
+                slot_x:slot_x + footprint[0] * self.slot_size[0]
+            ]
+            
+            # Store slot information
+            slots.append({
+                'position': (row, col),
+                'coordinates': (slot_x + origin[0], slot_y + origin[1]),
+                'footprint': footprint,
+                'image': slot_image
+            })
         
         return slots
     
-    def is_slot_empty(self, slot_image: np.ndarray) -> bool:
+    def find_item_footprint(self, gray: np.ndarray, occupied: np.ndarray,
+                            covered: np.ndarray, row: int, col: int) -> Tuple[int, int]:
         """
-        Determines if a slot is empty by checking its color.
-        Empty slots have a characteristic gray color.
+        Works out how many cells (columns, rows) the item starting at (row, col) covers.
+        Neighbouring occupied cells belong to the same item when there is no
+        grid line between them.
+        """
+        rows, cols = occupied.shape
+        
+        def free(r, c):
+            return occupied[r, c] and not covered[r, c]
+        
+        # Grow to the right first...
+        width = 1
+        while (col + width < cols and free(row, col + width)
+               and not self.has_grid_line(gray, row, col + width, vertical=True)):
+            width += 1
+        
+        # ...then down, as long as the whole next row of cells joins up
+        height = 1
+        while (row + height < rows
+               and all(free(row + height, c) for c in range(col, col + width))
+               and not any(self.has_grid_line(gray, row + height, c, vertical=False)
+                           for c in range(col, col + width))):
+            height += 1
+        
+        return (width, height)
+    
+    def has_grid_line(self, gray: np.ndarray, row: int, col: int, vertical: bool) -> bool:
         """
-        # Calculate the average color of the slot
-        avg_color = np.mean(slot_image, axis=(0, 1))
+        Checks for a grid line on the left (vertical) or top edge of a cell.
+        A grid line is a thin, uniform strip that stands out from the pixels
+        on both sides of it. Item art crossing the edge breaks that pattern.
+        """
+        sw, sh = self.slot_size
+        x, y = col * sw, row * sh
+        
+        # Look at the strip of pixels across the edge; the line itself can be
+        # on either side of the boundary (offset -1 or 0)
+        if vertical:
+            strip = gray[y:y + sh, x - 3:x + 3].T
+        else:
+            strip = gray[y - 3:y + 3, x:x + sw]
         
-        # Check if it matches empty slot color
-        # Empty slots are usually uniform gray
-        color_variance = np.var(slot_image, axis=(0, 1))
+        if strip.shape[0] < 6:
+            return True
         
-        # Low variance + gray color = probably empty
-        is_gray = all(40 < c < 80 for c in avg_color)
-        is_uniform = all(v < 100 for v in color_variance)
+        means = strip.mean(axis=1)
+        stds = strip.std(axis=1)
+        for offset in (2, 3):
+            is_uniform = stds[offset] < self.grid_line_max_std
+            stands_out = (abs(means[offset] - means[0]) > self.grid_line_min_contrast
+                          and abs(means[offset] - means[5]) > self.grid_line_min_contrast)
+            if is_uniform and stands_out:
+                return True
         
-        return is_gray and is_uniform
\ No newline at end of file
+        return False
+    
+    def is_slot_empty(self, slot_image: np.ndarray) -> bool:
+        """
+        Determines if a slot is empty by checking its color.
+        Empty slots have a characteristic gray color.
+        """
+        # Same check as the whole-grid version, on a 1x1 grid
+        return bool(self.empty_cell_mask(slot_image[np.newaxis, np.newaxis])[0, 0])
\ No newline at end of file
@@ -0,0 +1,104 @@
+import json
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, Optional
+
+def normalize_name(name: str) -> str:
+    """
+    Lowercase, hyphenated form of an item name in the style of tarkov.dev's
+    normalizedName, e.g. "Salewa first aid kit" -> "salewa-first-aid-kit".
+    """
+    name = re.sub(r"[^a-z0-9\s-]", "", name.lower())
+    return re.sub(r"[\s-]+", "-", name).strip("-")
+
+class ItemCatalog:
+    """
+    Every item record, indexed by id, exact name, normalized name, short name
+    and image filename. All indexes point at the same record objects, so the
+    catalog costs one dict entry per key rather than a copy of each item.
+
+    Works with both tarkov.dev API items (shortName, normalizedName) and the
+    records in data/items.json (short_name, image_filename).
+    """
+
+    def __init__(self, records: Iterable[Dict] = ()):
+        self.records: List[Dict] = []
+        self.by_id: Dict[str, Dict] = {}
+        self.by_name: Dict[str, Dict] = {}
+        self.by_normalized_name: Dict[str, Dict] = {}
+        self.by_short_name: Dict[str, Dict] = {}
+        self.by_image_filename: Dict[str, Dict] = {}
+        for record in records:
+            self.add(record)
+
+    @classmethod
+    def from_file(cls, items_file: str = "data/items.json") -> 'ItemCatalog':
+        """Builds a catalog from an items.json list, or an empty one if it can't be read."""
+        if not os.path.exists(items_file):
+            return cls()
+        try:
+            with open(items_file, 'r', encoding='utf-8') as f:
+                return cls(json.load(f))
+        except Exception as e:
+            print(f"Error loading item catalog {items_file}: {e}")
+            return cls()
+
+    def add(self, record: Dict):
+        """
+        Adds a record to every index it has a key for.
+        If two records share a key the first one keeps it.
+        """
+        self.records.append(record)
+
+        if record.get('id'):
+            self.by_id.setdefault(record['id'], record)
+        name = record.get('name')
+        if name:
+            self.by_name.setdefault(name, record)
+            self.by_normalized_name.setdefault(normalize_name(name), record)
+        if record.get('normalizedName'):
+            self.by_normalized_name.setdefault(record['normalizedName'], record)
+        short_name = record.get('shortName') or record.get('short_name')
+        if short_name:
+            self.by_short_name.setdefault(short_name, record)
+        if record.get('image_filename'):
+            self.by_image_filename.setdefault(record['image_filename'], record)
+
+    def get_by_id(self, item_id: str) -> Optional[Dict]:
+        """The item with this tarkov.dev id."""
+        return self.by_id.get(item_id)
+
+    def get_by_name(self, name: str) -> Optional[Dict]:
+        """The item with exactly this name."""
+        return self.by_name.get(name)
+
+    def get_by_normalized_name(self, name: str) -> Optional[Dict]:
+        """The item whose normalized name matches this name once normalized."""
+        return self.by_normalized_name.get(normalize_name(name))
+
+    def get_by_short_name(self, short_name: str) -> Optional[Dict]:
+        """The item with this short name (e.g. "Salewa")."""
+        return self.by_short_name.get(short_name)
+
+    def get_by_image_filename(self, image_filename: str) -> Optional[Dict]:
+        """The item whose template is this file."""
+        return self.by_image_filename.get(image_filename)
+
+    def find(self, name: str) -> Optional[Dict]:
+        """
+        Looks an item up by whatever name we have for it: the exact name, its
+        normalized form, a template name (image filename without .png) or a short name.
+        """
+        return (self.by_name.get(name)
+                or self.by_normalized_name.get(name)
+                or self.get_by_normalized_name(name)
+                or self.by_image_filename.get(f"{name}.png")
+                or self.by_short_name.get(name))
+
+    def __len__(self) -> int:
+        """Number of records."""
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Iterates over the records in the order they were added."""
+        return iter(self.records)
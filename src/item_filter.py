@@ -0,0 +1,51 @@
+import numpy as np
+from typing import Optional
+
+from item_store import ItemStore
+from search_index import TrigramIndex
+
+class ItemFilter:
+    """
+    Filters an ItemStore with boolean masks instead of a loop over item dicts.
+    Everything that doesn't depend on the filter values (lowercase names,
+    prices per source, category codes) is worked out once up front.
+    """
+
+    def __init__(self, store: ItemStore):
+        self.store = store
+
+        # Trigram index over names and short names for the search box
+        self.search_index = TrigramIndex(list(store.names), list(store.short_names))
+
+        # Prices per source. The price filter uses the trader price, or the
+        # flea price for items no trader buys.
+        self.prices = {
+            'trader': store.prices('trader'),
+            'flea': store.prices('flea'),
+            'best': store.prices('best'),
+            'filter': np.where(store.trader_prices > 0, store.trader_prices, store.flea_prices)
+        }
+
+        self.category_codes = store.categories.codes
+
+    def evaluate(self, search: str = '', min_price: Optional[int] = None,
+                 max_price: Optional[int] = None, category: Optional[str] = None) -> np.ndarray:
+        """
+        Returns the indices of the items matching every filter: in store
+        order, or best match first when searching. Category None means all categories.
+        """
+        mask = np.ones(len(self.store), dtype=bool)
+
+        prices = self.prices['filter']
+        if min_price is not None:
+            mask &= prices >= min_price
+        if max_price is not None:
+            mask &= prices <= max_price
+        if category is not None:
+            mask &= self.category_codes == self.store.categories.code_of(category)
+
+        if search:
+            ranked = self.search_index.search(search)
+            return ranked[mask[ranked]]
+
+        return np.flatnonzero(mask)
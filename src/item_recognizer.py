@@ -1,27 +1,154 @@
 import cv2
 import numpy as np
 import os
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 import json
 
+import template_pack
+from template_bank import TemplateBank, COARSE_METRICS
+from hash_index import PerceptualHashIndex
+
 class ItemRecognizer:
     """Recognizes Tarkov items from inventory slot images."""
     
-    def __init__(self, templates_path: str = "data/items"):
+    def __init__(self, templates_path: str = "data/items", slot_size: Tuple[int, int] = (63, 63),
+                 candidate_count: int = 50, coarse_metric: str = 'combined',
+                 audit_interval: int = 50, items_file: str = "data/items.json",
+                 max_bank_side: int = 126, use_hash_index: bool = True,
+                 hash_method: str = 'dhash', hash_max_distance: int = 4,
+                 pack_path: Optional[str] = "data/cache/templates", pack_only: bool = False):
         self.templates_path = templates_path
+        self.items_file = items_file
+        # Compiled template pack (<pack_path>.bin + .json); None disables it
+        self.pack_path = pack_path
+        # Only open an up-to-date pack, never decode PNGs or write the pack.
+        # Worker processes use this so they don't all rebuild it at once.
+        self.pack_only = pack_only
+        # Fingerprint of the pack on disk that matches what's loaded, if any
+        self.pack_fingerprint: Optional[str] = None
         self.templates = {}
         self.item_data = {}
+        
+        # Grid footprint (columns, rows) of every template, from items.json
+        self.footprints: Dict[str, Tuple[int, int]] = {}
+        
+        # Coarse-to-fine settings: stage one keeps the best `candidate_count`
+        # templates by tiny signature (0 disables pruning), stage two runs the
+        # full match on those only.
+        if coarse_metric not in COARSE_METRICS:
+            raise ValueError(f"Unknown coarse metric '{coarse_metric}', expected one of {COARSE_METRICS}")
+        self.candidate_count = candidate_count
+        self.coarse_metric = coarse_metric
+        
+        # Every `audit_interval` recognitions we also run the unpruned match
+        # to measure how often stage one threw away the real item (0 = never)
+        self.audit_interval = audit_interval
+        self.recognitions = 0
+        self.pruning_stats = {'audited': 0, 'pruned': 0}
+        
+        # One template bank per grid footprint (columns, rows), so a slot is only
+        # compared against items of the same size. Big items keep their aspect
+        # ratio but are matched at most `max_bank_side` pixels on the long side.
+        self.slot_size = slot_size
+        self.max_bank_side = max_bank_side
+        self.banks: Dict[Tuple[int, int], TemplateBank] = {}
+        
+        # Optional perceptual-hash shortcut, also one per footprint. A slot whose
+        # hash is within `hash_max_distance` bits of exactly one item is resolved
+        # without any template matching; ambiguous slots fall through.
+        self.use_hash_index = use_hash_index
+        self.hash_method = hash_method
+        self.hash_max_distance = hash_max_distance
+        self.hash_indexes: Dict[Tuple[int, int], PerceptualHashIndex] = {}
+        self.hash_stats = {'hits': 0, 'misses': 0}
         self.load_templates()
         
     def load_templates(self):
         """
         Loads item icon templates from the data folder.
         Each item should have a .png icon and a .json data file.
+        
+        Preprocessed templates are kept in a compiled pack; as long as the
+        source files haven't changed, startup just memory-maps that pack
+        instead of decoding every PNG again.
         """
         if not os.path.exists(self.templates_path):
             print(f"Creating templates directory at {self.templates_path}")
             os.makedirs(self.templates_path)
             return
+        
+        grid_sizes = self.load_grid_sizes()
+        fingerprint = self.source_fingerprint(grid_sizes)
+        
+        if self.pack_path and self.load_pack(fingerprint):
+            return
+        
+        if self.pack_only:
+            print(f"Template pack {self.pack_path} is missing or out of date, not rebuilding it here")
+            return
+        
+        if self.pack_path:
+            print("Rebuilding template pack...")
+        self.decode_templates(grid_sizes)
+        self.build_indexes()
+        
+        if self.pack_path:
+            self.save_pack(fingerprint)
+    
+    def source_fingerprint(self, grid_sizes: Optional[Dict[str, Tuple[int, int]]] = None) -> str:
+        """
+        Fingerprint of the template sources and settings the pack is built from.
+        """
+        if grid_sizes is None:
+            grid_sizes = self.load_grid_sizes()
+        # Templates only use items.json for grid sizes, so the pack depends on
+        # that mapping rather than the file (which changes with every price update)
+        return template_pack.source_fingerprint(
+            self.templates_path,
+            settings={
+                'slot_size': list(self.slot_size),
+                'max_bank_side': self.max_bank_side,
+                'hash_method': self.hash_method if self.use_hash_index else None,
+                'grid_sizes': template_pack.mapping_hash(grid_sizes)
+            }
+        )
+    
+    def pack_ready(self) -> bool:
+        """
+        Whether the pack on disk holds exactly the templates this recognizer
+        has loaded and the sources haven't changed since, so a pack_only
+        recognizer (e.g. in a worker process) would see the same templates.
+        """
+        return (bool(self.pack_path) and self.pack_fingerprint is not None
+                and self.pack_fingerprint == self.source_fingerprint())
+    
+    def load_grid_sizes(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Reads the grid size of every item from items.json, keyed by template
+        name (image filename without .png).
+        """
+        grid_sizes = {}
+        if os.path.exists(self.items_file):
+            try:
+                with open(self.items_file, 'r', encoding='utf-8') as f:
+                    for item in json.load(f):
+                        if item.get('image_filename') and item.get('grid_size'):
+                            grid_sizes[item['image_filename'][:-4]] = tuple(item['grid_size'])
+            except (OSError, ValueError) as e:
+                print(f"Error reading grid sizes from {self.items_file}: {e}")
+        return grid_sizes
+    
+    def decode_templates(self, grid_sizes: Optional[Dict[str, Tuple[int, int]]] = None):
+        """
+        Reads every template PNG (and its JSON data file) from the templates folder.
+        grid_sizes maps template names to grid sizes (see load_grid_sizes).
+        """
+        if grid_sizes is None:
+            grid_sizes = self.load_grid_sizes()
+        
+        self.templates = {}
+        self.item_data = {}
+        self.footprints = {}
             
         for filename in os.listdir(self.templates_path):
             if filename.endswith('.png'):
@@ -40,46 +167,272 @@ class ItemRecognizer:
                         with open(data_path, 'r') as f:
                             self.item_data[item_name] = json.load(f)
                     
-                    print(f"Loaded template for {item_name}")
+                    # Work out how many grid cells the item covers
+                    grid_size = grid_sizes.get(item_name) or self.item_data.get(item_name, {}).get('grid_size')
+                    if grid_size:
+                        self.footprints[item_name] = (int(grid_size[0]), int(grid_size[1]))
+                    else:
+                        self.footprints[item_name] = self.footprint_of(template)
         
         print(f"Loaded {len(self.templates)} item templates")
     
-    def recognize_item(self, slot_image: np.ndarray, confidence_threshold: float = 0.8) -> Optional[str]:
+    def build_indexes(self):
+        """
+        Buckets templates by footprint, then pre-resizes and stacks each bucket once.
+        """
+        buckets: Dict[Tuple[int, int], Dict[str, np.ndarray]] = {}
+        for item_name, template in self.templates.items():
+            buckets.setdefault(self.footprints[item_name], {})[item_name] = template
+        
+        self.banks = {}
+        self.hash_indexes = {}
+        for footprint, templates in buckets.items():
+            bank = TemplateBank(self.bank_size(footprint))
+            bank.build(templates)
+            self.banks[footprint] = bank
+            
+            if self.use_hash_index:
+                index = PerceptualHashIndex(self.hash_method, self.hash_max_distance)
+                index.build(templates)
+                self.hash_indexes[footprint] = index
+        
+        print(f"Built {len(self.banks)} template banks by grid size")
+    
+    def save_pack(self, fingerprint: str):
+        """
+        Writes the template banks and hash indexes to the compiled template pack.
+        """
+        arrays = {}
+        buckets = []
+        for footprint, bank in self.banks.items():
+            key = f"{footprint[0]}x{footprint[1]}"
+            arrays[f"{key}/vectors"] = bank.vectors
+            arrays[f"{key}/gray"] = bank.gray_signatures
+            arrays[f"{key}/color"] = bank.color_signatures
+            if footprint in self.hash_indexes:
+                arrays[f"{key}/hashes"] = np.array(self.hash_indexes[footprint].hashes, dtype=np.uint64)
+            buckets.append({'footprint': list(footprint), 'size': list(bank.size), 'names': bank.names})
+        
+        meta = {
+            'fingerprint': fingerprint,
+            'buckets': buckets,
+            'item_data': self.item_data,
+            'footprints': {name: list(footprint) for name, footprint in self.footprints.items()}
+        }
+        
+        try:
+            template_pack.write_pack(self.pack_path, arrays, meta)
+            self.pack_fingerprint = fingerprint
+            print(f"Saved compiled template pack to {self.pack_path}")
+        except OSError as e:
+            self.pack_fingerprint = None
+            print(f"Could not save template pack: {e}")
+    
+    def load_pack(self, fingerprint: str) -> bool:
+        """
+        Memory-maps the compiled template pack if it matches the current sources.
+        Returns True if the pack was loaded.
+        """
+        pack = template_pack.read_pack(self.pack_path)
+        if pack is None:
+            return False
+            
+        arrays, meta = pack
+        if meta.get('fingerprint') != fingerprint:
+            print("Template pack is out of date")
+            return False
+        
+        # Decoded PNGs are only needed to build a pack, not to use one
+        self.templates = {}
+        self.item_data = meta['item_data']
+        self.footprints = {name: tuple(footprint) for name, footprint in meta['footprints'].items()}
+        
+        self.banks = {}
+        self.hash_indexes = {}
+        for bucket in meta['buckets']:
+            footprint = tuple(bucket['footprint'])
+            key = f"{footprint[0]}x{footprint[1]}"
+            self.banks[footprint] = TemplateBank.from_arrays(
+                tuple(bucket['size']), bucket['names'],
+                arrays[f"{key}/vectors"], arrays[f"{key}/gray"], arrays[f"{key}/color"]
+            )
+            if self.use_hash_index:
+                index = PerceptualHashIndex(self.hash_method, self.hash_max_distance)
+                index.build_from_hashes(bucket['names'], arrays[f"{key}/hashes"].tolist())
+                self.hash_indexes[footprint] = index
+        
+        self.pack_fingerprint = fingerprint
+        print(f"Loaded {len(self.footprints)} item templates from {self.pack_path}")
+        return True
+    
+    def get_settings(self, pack_only: bool = False) -> Dict:
+        """
+        Returns the constructor arguments needed to create an equivalent
+        recognizer, e.g. inside a worker process (with pack_only, so it only
+        opens the compiled pack).
+        """
+        return {
+            'templates_path': self.templates_path,
+            'slot_size': self.slot_size,
+            'candidate_count': self.candidate_count,
+            'coarse_metric': self.coarse_metric,
+            'audit_interval': self.audit_interval,
+            'items_file': self.items_file,
+            'max_bank_side': self.max_bank_side,
+            'use_hash_index': self.use_hash_index,
+            'hash_method': self.hash_method,
+            'hash_max_distance': self.hash_max_distance,
+            'pack_path': self.pack_path,
+            'pack_only': pack_only
+        }
+    
+    def footprint_of(self, image: np.ndarray) -> Tuple[int, int]:
+        """
+        Guesses the grid footprint (columns, rows) of an image from its pixel size.
+        """
+        cols = max(1, int(round(image.shape[1] / self.slot_size[0])))
+        rows = max(1, int(round(image.shape[0] / self.slot_size[1])))
+        return (cols, rows)
+    
+    def bank_size(self, footprint: Tuple[int, int]) -> Tuple[int, int]:
+        """
+        Pixel size (width, height) templates of a footprint are matched at.
+        Keeps the item's aspect ratio instead of squashing it into one slot.
+        """
+        width = footprint[0] * self.slot_size[0]
+        height = footprint[1] * self.slot_size[1]
+        scale = min(1.0, self.max_bank_side / max(width, height))
+        return (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    
+    def get_bank(self, footprint: Tuple[int, int]) -> Optional[TemplateBank]:
+        """
+        Gets the template bank holding every item with the given footprint.
+        """
+        return self.banks.get(footprint)
+    
+    def recognize_item(self, slot_image: np.ndarray, confidence_threshold: float = 0.8,
+                       footprint: Optional[Tuple[int, int]] = None) -> Optional[str]:
         """
         Attempts to recognize an item in the given slot image.
+        `footprint` is the (columns, rows) the item covers in the grid;
+        if omitted it is guessed from the image size.
         Returns the item name or None if no match found.
         """
         if slot_image is None or slot_image.size == 0:
             return None
-            
-        best_match = None
-        best_score = 0
         
-        # Try to match against each template
-        for item_name, template in self.templates.items():
-            # Ensure template and slot image are the same size
-            if template.shape[:2] != slot_image.shape[:2]:
-                template_resized = cv2.resize(template, 
-                                            (slot_image.shape[1], slot_image.shape[0]))
-            else:
-                template_resized = template
-            
-            # Perform template matching
-            result = cv2.matchTemplate(slot_image, template_resized, cv2.TM_CCOEFF_NORMED)
-            score = np.max(result)
+        # Slots can be strided BGRA views straight into the screenshot.
+        # Drop alpha and copy just this slot into a compact BGR array.
+        slot_image = np.ascontiguousarray(slot_image[:, :, :3])
             
-            # Keep track of the best match
+        # Only items with the same footprint can possibly match. Items can be
+        # rotated in the inventory: a rotated item covers the transposed
+        # footprint and its icon is turned 90°, so that bucket is searched too.
+        footprint = footprint or self.footprint_of(slot_image)
+        attempts = [(footprint, slot_image)]
+        rotated = (footprint[1], footprint[0])
+        if rotated != footprint and rotated in self.banks:
+            attempts.append((rotated, cv2.rotate(slot_image, cv2.ROTATE_90_CLOCKWISE)))
+            attempts.append((rotated, cv2.rotate(slot_image, cv2.ROTATE_90_COUNTERCLOCKWISE)))
+        
+        best_match, best_score, best_method, best_bucket = None, -1.0, None, footprint
+        for bucket, image in attempts:
+            item_name, score, method = self.match_in_bucket(image, bucket, confidence_threshold)
             if score > best_score:
-                best_score = score
-                best_match = item_name
+                best_match, best_score, best_method, best_bucket = item_name, score, method, bucket
+            # Upright items are the common case; only try rotations if that fails
+            if score >= confidence_threshold:
+                break
         
         # Only return a match if we're confident enough
-        if best_score >= confidence_threshold:
-            print(f"Recognized {best_match} with confidence {best_score:.2f}")
+        if best_match and best_score >= confidence_threshold:
+            how = "by perceptual hash" if best_method == 'hash' else f"with confidence {best_score:.2f}"
+            rotation = " (rotated)" if best_bucket != footprint else ""
+            print(f"Recognized {best_match}{rotation} {how}")
             return best_match
         
         return None
     
+    def match_in_bucket(self, slot_image: np.ndarray, footprint: Tuple[int, int],
+                        confidence_threshold: float) -> Tuple[Optional[str], float, Optional[str]]:
+        """
+        Finds the best match for a slot among the items of one footprint.
+        Returns (item name, score, method) where method is 'hash' for a
+        perceptual hash hit (scored 1.0) or 'template' for template matching.
+        """
+        bank = self.get_bank(footprint)
+        if bank is None:
+            return None, -1.0, None
+        
+        # Clean icons are usually resolved by their hash alone
+        index = self.hash_indexes.get(footprint)
+        if index is not None:
+            item_name = index.lookup(slot_image)
+            if item_name:
+                self.hash_stats['hits'] += 1
+                return item_name, 1.0, 'hash'
+            self.hash_stats['misses'] += 1
+        
+        if self.candidate_count > 0:
+            # Stage one: cheap signatures narrow the search down to a few candidates
+            rows = bank.candidates(slot_image, self.candidate_count, self.coarse_metric)
+            # Stage two: full TM_CCOEFF_NORMED on the survivors only
+            best_match, best_score = bank.best_match(slot_image, rows)
+            
+            self.recognitions += 1
+            if self.audit_interval and self.recognitions % self.audit_interval == 0:
+                self.audit_pruning(bank, slot_image, best_match, confidence_threshold)
+        else:
+            # Score the slot against every template in one pass
+            best_match, best_score = bank.best_match(slot_image)
+        
+        return best_match, float(best_score), 'template'
+    
+    def audit_pruning(self, bank: TemplateBank, slot_image: np.ndarray,
+                      pruned_match: Optional[str], confidence_threshold: float):
+        """
+        Runs the full, unpruned match and records whether stage one
+        discarded the item the full search would have picked.
+        """
+        true_match, true_score = bank.best_match(slot_image)
+        
+        # Slots nothing matches confidently don't tell us anything
+        if true_score < confidence_threshold:
+            return
+            
+        self.pruning_stats['audited'] += 1
+        if true_match != pruned_match:
+            self.pruning_stats['pruned'] += 1
+    
+    def get_pruning_rate(self) -> float:
+        """
+        Returns the fraction of audited slots whose true match was pruned by stage one.
+        """
+        audited = self.pruning_stats['audited']
+        return self.pruning_stats['pruned'] / audited if audited else 0.0
+    
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Recognition counters as one flat dict, e.g. to send back from a worker process.
+        """
+        return {
+            'recognitions': self.recognitions,
+            'audited': self.pruning_stats['audited'],
+            'pruned': self.pruning_stats['pruned'],
+            'hash_hits': self.hash_stats['hits'],
+            'hash_misses': self.hash_stats['misses']
+        }
+    
+    def merge_stats(self, stats: Dict[str, int]):
+        """
+        Adds counters collected by another recognizer (see get_stats) to this one's.
+        """
+        self.recognitions += stats.get('recognitions', 0)
+        self.pruning_stats['audited'] += stats.get('audited', 0)
+        self.pruning_stats['pruned'] += stats.get('pruned', 0)
+        self.hash_stats['hits'] += stats.get('hash_hits', 0)
+        self.hash_stats['misses'] += stats.get('hash_misses', 0)
+    
     def get_item_info(self, item_name: str) -> Dict:
         """
         Gets stored information about an item.
@@ -0,0 +1,208 @@
+import json
+import os
+import numpy as np
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from item_catalog import ItemCatalog
+
+# Price sources the store can answer for
+PRICE_SOURCES = ('trader', 'flea', 'best')
+
+class StringTable:
+    """
+    Many strings stored as one string plus an offset array, instead of one
+    Python object per string. strings[i] slices the i-th one back out.
+    """
+
+    def __init__(self, strings: Iterable[str] = ()):
+        strings = list(strings)
+        self.data = ''.join(strings)
+        self.offsets = np.zeros(len(strings) + 1, dtype=np.int32)
+        np.cumsum([len(s) for s in strings], out=self.offsets[1:])
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return self.data[self.offsets[index]:self.offsets[index + 1]]
+
+    def __iter__(self) -> Iterator[str]:
+        data, offsets = self.data, self.offsets.tolist()
+        for start, end in zip(offsets, offsets[1:]):
+            yield data[start:end]
+
+    def lower(self) -> 'StringTable':
+        """The same table with every string lowercased."""
+        lowered = self.data.lower()
+        if len(lowered) == len(self.data):
+            table = StringTable()
+            table.data = lowered
+            table.offsets = self.offsets
+            return table
+        # A few characters lowercase to more than one; redo it string by string
+        return StringTable(s.lower() for s in self)
+
+class Categories:
+    """A categorical column: a small list of distinct values plus a code per row."""
+
+    def __init__(self, values: Iterable[str]):
+        self.labels: List[str] = []
+        lookup: Dict[str, int] = {}
+        codes = []
+        for value in values:
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(self.labels)
+                self.labels.append(value)
+            codes.append(code)
+        dtype = np.uint8 if len(self.labels) <= 256 else np.uint16
+        self.codes = np.array(codes, dtype=dtype)
+
+    def code_of(self, label: str) -> int:
+        """The code of a label, or -1 if no row has it."""
+        try:
+            return self.labels.index(label)
+        except ValueError:
+            return -1
+
+    def __getitem__(self, index: int) -> str:
+        return self.labels[self.codes[index]]
+
+class ItemRow:
+    """
+    A lightweight view of one item in an ItemStore.
+    Supports item['name'] and item.get('trader_price') like the item dicts it
+    replaces, but nothing is copied until a field is read.
+    """
+
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store: 'ItemStore', index: int):
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, key: str):
+        getter = ItemRow.FIELDS.get(key)
+        if getter is None:
+            raise KeyError(key)
+        return getter(self.store, self.index)
+
+    def get(self, key: str, default=None):
+        getter = ItemRow.FIELDS.get(key)
+        return getter(self.store, self.index) if getter else default
+
+    def to_dict(self) -> Dict:
+        """All fields as a plain dict, e.g. for showing the raw item."""
+        return {key: getter(self.store, self.index) for key, getter in ItemRow.FIELDS.items()}
+
+    # Field name -> how to read it from the columns, matching the items.json record layout
+    FIELDS: Dict[str, Callable] = {
+        'id': lambda store, i: store.ids[i],
+        'name': lambda store, i: store.names[i],
+        'short_name': lambda store, i: store.short_names[i],
+        'trader_price': lambda store, i: {
+            'price': int(store.trader_prices[i]),
+            'trader': store.traders[i],
+            'currency': store.currencies[i]
+        },
+        'avg_flea_price': lambda store, i: int(store.flea_prices[i]),
+        'grid_size': lambda store, i: [int(store.grid_widths[i]), int(store.grid_heights[i])],
+        'image_filename': lambda store, i: store.image_filenames[i],
+        'category': lambda store, i: store.categories[i]
+    }
+
+class ItemStore:
+    """
+    The item database in columns: strings in string tables, prices in int64
+    arrays, grid sizes in uint8 arrays and traders/categories as small
+    integer codes. Filtering, sorting and totals become array operations and
+    an item costs tens of bytes instead of a few nested dicts.
+    """
+
+    def __init__(self, records: List[Dict], categorize: Optional[Callable[[str], str]] = None):
+        """
+        Builds the columns from item records (the items.json layout).
+        categorize(name) gives each item's category; without it every item is 'Miscellaneous'.
+        """
+        names = [record.get('name', '') for record in records]
+        trader_prices = [record.get('trader_price') or {} for record in records]
+
+        self.ids = StringTable(record.get('id') or '' for record in records)
+        self.names = StringTable(names)
+        self.short_names = StringTable(record.get('short_name') or '' for record in records)
+        self.image_filenames = StringTable(record.get('image_filename') or '' for record in records)
+
+        self.trader_prices = np.array([price.get('price') or 0 for price in trader_prices], dtype=np.int64)
+        self.flea_prices = np.array([record.get('avg_flea_price') or 0 for record in records], dtype=np.int64)
+        self.traders = Categories(price.get('trader') or 'None' for price in trader_prices)
+        self.currencies = Categories(price.get('currency') or 'RUB' for price in trader_prices)
+
+        grid_sizes = [record.get('grid_size') or [1, 1] for record in records]
+        self.grid_widths = np.array([size[0] for size in grid_sizes], dtype=np.uint8)
+        self.grid_heights = np.array([size[1] for size in grid_sizes], dtype=np.uint8)
+
+        self.categories = Categories(
+            categorize(name) if categorize else 'Miscellaneous' for name in names
+        )
+
+        # Name lookups (an ItemCatalog of small key records), built on first use
+        self.catalog: Optional[ItemCatalog] = None
+
+    @classmethod
+    def from_file(cls, items_file: str = "data/items.json",
+                  categorize: Optional[Callable[[str], str]] = None) -> 'ItemStore':
+        """Builds a store from an items.json list, or an empty one if it can't be read."""
+        records = []
+        if os.path.exists(items_file):
+            try:
+                with open(items_file, 'r', encoding='utf-8') as f:
+                    records = json.load(f)
+            except Exception as e:
+                print(f"Error loading item store {items_file}: {e}")
+        return cls(records, categorize)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __iter__(self) -> Iterator[ItemRow]:
+        return (ItemRow(self, i) for i in range(len(self)))
+
+    def row(self, index: int) -> ItemRow:
+        """A view of the item at this index."""
+        return ItemRow(self, index)
+
+    def prices(self, source: str = 'trader') -> np.ndarray:
+        """Price of every item from the given source ('trader', 'flea' or 'best')."""
+        if source == 'trader':
+            return self.trader_prices
+        if source == 'flea':
+            return self.flea_prices
+        if source == 'best':
+            return np.maximum(self.trader_prices, self.flea_prices)
+        raise ValueError(f"Unknown price source '{source}', expected one of {PRICE_SOURCES}")
+
+    def sort_order(self, indices: np.ndarray, source: str = 'trader', descending: bool = True) -> np.ndarray:
+        """The given item indices ordered by price."""
+        prices = self.prices(source)[indices]
+        order = np.argsort(-prices if descending else prices, kind='stable')
+        return indices[order]
+
+    def total_value(self, indices: np.ndarray, source: str = 'trader') -> int:
+        """Sum of the prices of the given items."""
+        return int(self.prices(source)[indices].sum())
+
+    def find(self, name: str) -> int:
+        """
+        Index of an item by any name ItemCatalog.find understands (exact,
+        normalized, template or short name), or -1 if there is none.
+        """
+        if self.catalog is None:
+            # Only the keys the catalog indexes, plus where the row lives
+            self.catalog = ItemCatalog(
+                {'id': item_id, 'name': item_name, 'short_name': short_name,
+                 'image_filename': image_filename, 'index': index}
+                for index, (item_id, item_name, short_name, image_filename)
+                in enumerate(zip(self.ids, self.names, self.short_names, self.image_filenames))
+            )
+        record = self.catalog.find(name)
+        return record['index'] if record else -1
@@ -5,6 +5,9 @@ import keyboard
 import sys
 import os
 import queue
+import multiprocessing
+import tracemalloc
+from typing import List, Optional
 
 # Add src directory to path so we can import our modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -12,6 +15,10 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from screen_capture import ScreenCapture
 from inventory_detector import InventoryDetector
 from item_recognizer import ItemRecognizer
+from recognition_pool import RecognitionPool
+from change_detection import SlotChangeTracker, FrameChangeGate
+from pipeline import ScanPipeline
+from scheduler import AdaptiveScheduler
 from price_tracker import PriceTracker
 from overlay import PriceOverlay
 
@@ -21,12 +28,34 @@ class TarkovScanner:
     def __init__(self):
         print("Initializing Tarkov Inventory Scanner...")
         
-        # Initialize all components
-        self.screen_capture = ScreenCapture()
+        # Frames waiting between pipeline stages (older ones are dropped)
+        self.pipeline_queue_size = 1
+        self.pipeline = None
+        
+        # Initialize all components.
+        # Frames are captured into a ring of buffers that stay in use until the
+        # detect stage hands them back (it copies out the slots it needs), so a
+        # frame is never overwritten while it's being read. Buffers: the one
+        # being captured, the queued ones, the one being detected, and a spare.
+        self.screen_capture = ScreenCapture(
+            ring_size=self.pipeline_queue_size + 3, release_frames=True
+        )
         self.inventory_detector = InventoryDetector()
         self.item_recognizer = ItemRecognizer()
         self.price_tracker = PriceTracker()
         
+        # Recognition is spread over a pool of workers ('process' or 'thread')
+        self.recognition_workers = max(1, (os.cpu_count() or 1) - 1)
+        self.recognition_pool = RecognitionPool(self.item_recognizer, self.recognition_workers, mode='process')
+        
+        # Remembers what every slot looked like so unchanged slots aren't recognized again
+        self.slot_tracker = SlotChangeTracker()
+        
+        # Skips the whole pipeline while the screen isn't changing; one slot
+        # changing is enough to get through.
+        # frame_gate.stats has the processed/skipped counts for tuning the threshold.
+        self.frame_gate = FrameChangeGate(threshold=8.0)
+        
         # We'll initialize the overlay later in the main thread
         self.overlay = None
         
@@ -40,9 +69,16 @@ class TarkovScanner:
         self.update_queue = queue.Queue()
         
         # Scan settings
-        self.scan_interval = 1.0  # seconds between scans
+        self.scan_interval = 1.0  # seconds between status checks of the scan thread
         self.confidence_threshold = 0.8
         
+        # Scans quickly while the inventory is changing and backs off while
+        # it's closed or idle. scheduler.stats has the active/idle counts.
+        self.scheduler = AdaptiveScheduler(max_fps=10.0, max_interval=2.0)
+        
+        # Debug: report the peak memory allocated during each scan (tracemalloc)
+        self.trace_allocations = False
+        
         print("Scanner initialized. Press F9 to start/stop scanning.")
         
     def setup_hotkeys(self):
@@ -61,6 +97,8 @@ class TarkovScanner:
         if not self.scanning:
             print("Starting scanner...")
             self.scanning = True
+            self.frame_gate.reset()
+            self.scheduler.reset()
             
             # Start the scanning thread if it's not already running
             if not self.scan_thread or not self.scan_thread.is_alive():
@@ -84,7 +122,11 @@ class TarkovScanner:
                 self.overlay.show()
             
     def scan_loop(self):
-        """Main scanning loop that runs in a separate thread."""
+        """
+        Runs the scan pipeline in a separate thread until scanning stops.
+        Capture, detection, recognition and pricing each run in their own
+        stage thread, so a slow recognition never holds up capturing.
+        """
         # First, find the game window
         game_window = self.screen_capture.find_game_window()
         if not game_window:
@@ -92,77 +134,163 @@ class TarkovScanner:
             self.update_queue.put({"error": "Could not find game window"})
             return
             
+        if self.trace_allocations:
+            tracemalloc.start()
+            
+        self.pipeline = self.build_pipeline()
+        self.pipeline.start()
+        
         while self.scanning and self.running:
-            try:
-                # Capture the screen
-                screenshot = self.screen_capture.capture_screenshot()
-                if screenshot is None:
-                    print("Failed to capture screenshot")
-                    time.sleep(self.scan_interval)
-                    continue
-                
-                # Debug: Save a screenshot occasionally to verify capture is working
-                if hasattr(self, '_debug_counter'):
-                    self._debug_counter += 1
-                else:
-                    self._debug_counter = 0
-                
-                if self._debug_counter % 30 == 0:  # Every 30 seconds
-                    self.screen_capture.save_screenshot(screenshot, "debug_screenshot.png")
-                    print("Debug screenshot saved")
-                
-                # Find inventory region
-                inventory_region = self.inventory_detector.find_inventory_region(screenshot)
-                if not inventory_region:
-                    # Don't spam the console - inventory might just be closed
-                    time.sleep(self.scan_interval)
-                    continue
-                    
-                print(f"Found inventory at {inventory_region}")
-                
-                # Extract inventory slots
-                slots = self.inventory_detector.extract_inventory_slots(screenshot, inventory_region)
-                
-                # Process each slot
-                detected_items = []
-                for slot in slots:
-                    if slot['is_empty']:
-                        continue
-                        
-                    # Try to recognize the item
-                    item_name = self.item_recognizer.recognize_item(
-                        slot['image'], 
-                        self.confidence_threshold
-                    )
-                    
-                    if item_name:
-                        # Get price information
-                        price_info = self.price_tracker.get_item_price(item_name)
-                        if price_info:
-                            detected_items.append({
-                                'name': item_name,
-                                'price': price_info.get('price', 0),
-                                'trader': price_info.get('trader', 'Unknown'),
-                                'position': slot['position']
-                            })
-                
-                # Send update to the main thread via queue
-                if detected_items:
-                    print(f"Detected {len(detected_items)} items")
-                    self.update_queue.put({"items": detected_items})
-                else:
-                    print("No items detected in this scan")
-                    # Send empty list to clear overlay
-                    self.update_queue.put({"items": []})
-                
-            except Exception as e:
-                print(f"Error in scan loop: {e}")
-                self.update_queue.put({"error": str(e)})
-                
-            # Wait before next scan
             time.sleep(self.scan_interval)
             
+            if self.trace_allocations:
+                _, peak = tracemalloc.get_traced_memory()
+                print(f"Peak memory allocated during scan: {peak / 1024:.0f} KiB")
+                tracemalloc.reset_peak()
+                
+        # Don't make the capture stage finish a long idle wait first
+        self.scheduler.wake()
+        self.pipeline.stop()
+        
+        if self.trace_allocations:
+            tracemalloc.stop()
         print("Scan loop ended")
+        
+    def build_pipeline(self) -> ScanPipeline:
+        """Wires the scan stages together: capture -> detect -> recognize -> price."""
+        pipeline = ScanPipeline(
+            queue_size=self.pipeline_queue_size,
+            on_error=lambda stage, e: self.update_queue.put({"error": f"{stage}: {e}"})
+        )
+        pipeline.add_stage('capture', self.capture_stage, pace=self.scheduler.wait)
+        pipeline.add_stage('detect', self.detect_stage, on_drop=self.release_frame)
+        pipeline.add_stage('recognize', self.recognize_stage)
+        pipeline.add_stage('price', self.price_stage)
+        return pipeline
+        
+    def get_pipeline_metrics(self) -> dict:
+        """Per-stage queue depth, dropped frames and latency of the running pipeline."""
+        if not self.pipeline:
+            return {}
+        return self.pipeline.get_metrics()
+        
+    def capture_stage(self, _) -> Optional[dict]:
+        """Grabs a frame and passes it on if something on screen changed."""
+        screenshot = self.screen_capture.capture_screenshot()
+        if screenshot is None:
+            # Every buffer still being read just means detection is behind
+            if not self.screen_capture.frames_busy:
+                print("Failed to capture screenshot")
+            self.scheduler.report_idle()
+            return None
+        
+        # Debug: Save a screenshot occasionally to verify capture is working
+        if hasattr(self, '_debug_counter'):
+            self._debug_counter += 1
+        else:
+            self._debug_counter = 0
+        
+        if self._debug_counter % 30 == 0:  # Every 30 captures
+            self.screen_capture.save_screenshot(screenshot, "debug_screenshot.png")
+            print("Debug screenshot saved")
+        
+        # Nothing on screen changed, so the last result still stands
+        if not self.frame_gate.has_changed(screenshot):
+            self.screen_capture.release_frame(screenshot)
+            self.scheduler.report_idle()
+            return None
+        
+        # The screenshot may only cover part of the window, so its origin travels with it
+        return {'screenshot': screenshot, 'origin': self.screen_capture.capture_origin}
+        
+    def release_frame(self, frame: dict):
+        """Hands a frame's capture buffer back once nothing reads it anymore."""
+        self.screen_capture.release_frame(frame['screenshot'])
+        
+    def detect_stage(self, frame: dict) -> dict:
+        """Finds the inventory in a frame and cuts out the occupied slots."""
+        try:
+            return self.detect_slots(frame)
+        finally:
+            # Nothing after this stage keeps a view into the frame
+            self.release_frame(frame)
+        
+    def detect_slots(self, frame: dict) -> dict:
+        """Does the work of detect_stage."""
+        screenshot = frame['screenshot']
+        origin = frame['origin']
+        
+        inventory_region = self.inventory_detector.find_inventory_region(screenshot, origin)
+        if not inventory_region:
+            # Don't spam the console - inventory might just be closed.
+            # Go back to full-frame captures so we can find it again.
+            self.screen_capture.clear_roi()
+            self.scheduler.report_idle()
+            return {'slots': None}
+            
+        print(f"Found inventory at {inventory_region}")
+        
+        # From now on only capture the inventory (plus a margin), as often as allowed
+        self.screen_capture.set_roi(inventory_region)
+        self.scheduler.report_activity()
+        
+        # Extract the occupied inventory slots
+        occupied_slots = self.inventory_detector.extract_inventory_slots(
+            screenshot, inventory_region, origin
+        )
+        
+        # Slot images are views into the capture buffer, which is reused as soon
+        # as this stage is done. Copy the small crops so recognition (including
+        # jobs pickled later for worker processes) never sees a newer frame.
+        for slot in occupied_slots:
+            slot['image'] = slot['image'].copy()
+        return {'slots': occupied_slots}
+        
+    def recognize_stage(self, scan: dict) -> Optional[List[dict]]:
+        """Recognizes the slots that changed and returns (position, name) for every slot."""
+        if scan['slots'] is None:
+            # Inventory closed, everything has to be recognized again next time
+            self.slot_tracker.reset()
+            return None
+            
+        # Only slots that changed since the last scan need recognizing.
+        # They're done in parallel; results come back in slot order.
+        occupied_slots = scan['slots']
+        changed_slots = self.slot_tracker.find_changed(occupied_slots)
+        item_names = self.recognition_pool.recognize_slots(changed_slots, self.confidence_threshold)
+        self.slot_tracker.remember(changed_slots, item_names)
+        
+        # Only pass on what pricing needs
+        return [
+            {'position': slot['position'], 'name': self.slot_tracker.get_result(slot)}
+            for slot in occupied_slots
+        ]
+        
+    def price_stage(self, results: List[dict]):
+        """Looks up prices for the recognized items and sends them to the overlay."""
+        detected_items = []
+        for result in results:
+            item_name = result['name']
+            if item_name:
+                # Get price information
+                price_info = self.price_tracker.get_item_price(item_name)
+                if price_info:
+                    detected_items.append({
+                        'name': item_name,
+                        'price': price_info.get('price', 0),
+                        'trader': price_info.get('trader', 'Unknown'),
+                        'position': result['position']
+                    })
+        
+        # Send update to the main thread via queue
+        if detected_items:
+            print(f"Detected {len(detected_items)} items")
+            self.update_queue.put({"items": detected_items})
+        else:
+            print("No items detected in this scan")
+            # Send empty list to clear overlay
+            self.update_queue.put({"items": []})
+        return None
     
     def process_updates(self):
         """
@@ -203,6 +331,10 @@ class TarkovScanner:
         if hasattr(self, 'screen_capture'):
             self.screen_capture.cleanup()
             
+        # Stop the recognition workers
+        if hasattr(self, 'recognition_pool'):
+            self.recognition_pool.close()
+            
         # Close the overlay
         if self.overlay:
             self.overlay.close()
@@ -244,6 +376,9 @@ class TarkovScanner:
 
 def main():
     """Entry point of the application."""
+    # Needed for the recognition worker processes in the packaged .exe
+    multiprocessing.freeze_support()
+    
     # Check if we're running as administrator (recommended for keyboard hooks)
     try:
         import ctypes
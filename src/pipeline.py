@@ -0,0 +1,183 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+class DropOldestQueue:
+    """
+    A bounded queue that never blocks the producer: when it is full,
+    the oldest item is thrown away to make room for the new one.
+    That way a slow consumer always works on the freshest data.
+    `on_drop` is called with every item that is thrown away unprocessed,
+    e.g. to hand a frame buffer back.
+    """
+
+    def __init__(self, maxsize: int = 1, on_drop: Optional[Callable[[Any], None]] = None):
+        self.maxsize = maxsize
+        self.on_drop = on_drop
+        self.items = deque()
+        self.condition = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        """Adds an item, dropping the oldest one if the queue is full."""
+        dropped = None
+        with self.condition:
+            if len(self.items) >= self.maxsize:
+                dropped = self.items.popleft()
+                self.dropped += 1
+            self.items.append(item)
+            self.condition.notify()
+        if dropped is not None and self.on_drop:
+            self.on_drop(dropped)
+
+    def get(self, timeout: float = 0.1) -> Optional[Any]:
+        """Takes the oldest item, or returns None if nothing arrived within the timeout."""
+        with self.condition:
+            if not self.items:
+                self.condition.wait(timeout)
+            if not self.items:
+                return None
+            return self.items.popleft()
+
+    def qsize(self) -> int:
+        """Number of items currently waiting."""
+        with self.condition:
+            return len(self.items)
+
+    def clear(self):
+        """Throws away everything that is waiting."""
+        with self.condition:
+            items = list(self.items)
+            self.items.clear()
+        if self.on_drop:
+            for item in items:
+                self.on_drop(item)
+
+class PipelineStage:
+    """
+    One stage of the scan pipeline: a thread that takes items from its input
+    queue, runs `process` on them and passes any result on to the next stage.
+    A stage without an input queue is a source and calls `process(None)` in a loop,
+    calling `pace` before each run so it doesn't spin (the wait isn't counted as latency).
+    """
+
+    def __init__(self, name: str, process: Callable[[Any], Any],
+                 input_queue: Optional[DropOldestQueue] = None,
+                 output_queue: Optional[DropOldestQueue] = None,
+                 on_error: Optional[Callable[[str, Exception], None]] = None,
+                 pace: Optional[Callable[[], None]] = None):
+        self.name = name
+        self.process = process
+        self.pace = pace
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.on_error = on_error
+
+        self.running = False
+        self.thread = None
+
+        # Metrics
+        self.processed = 0
+        self.total_latency = 0.0
+        self.last_latency = 0.0
+
+    def start(self):
+        """Starts the stage's thread."""
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name=f"pipeline-{self.name}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Asks the stage to stop after the current item."""
+        self.running = False
+
+    def join(self, timeout: float = 2.0):
+        """Waits for the stage's thread to finish."""
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=timeout)
+
+    def run(self):
+        """The stage loop."""
+        while self.running:
+            item = None
+            if self.input_queue is not None:
+                item = self.input_queue.get(timeout=0.1)
+                if item is None:
+                    continue
+            elif self.pace is not None:
+                self.pace()
+                if not self.running:
+                    break
+
+            start = time.perf_counter()
+            try:
+                result = self.process(item)
+            except Exception as e:
+                print(f"Error in {self.name} stage: {e}")
+                if self.on_error:
+                    self.on_error(self.name, e)
+                result = None
+            self.last_latency = time.perf_counter() - start
+            self.total_latency += self.last_latency
+            self.processed += 1
+
+            if result is not None and self.output_queue is not None:
+                self.output_queue.put(result)
+
+    def get_metrics(self) -> Dict:
+        """Queue depth, drop count and latency numbers for this stage."""
+        return {
+            'queue_depth': self.input_queue.qsize() if self.input_queue else 0,
+            'dropped': self.input_queue.dropped if self.input_queue else 0,
+            'processed': self.processed,
+            'last_latency_ms': self.last_latency * 1000,
+            'avg_latency_ms': (self.total_latency / self.processed * 1000) if self.processed else 0.0
+        }
+
+class ScanPipeline:
+    """
+    Chains stages together with bounded drop-oldest queues, so a slow stage
+    never holds up the ones before it.
+    """
+
+    def __init__(self, queue_size: int = 1,
+                 on_error: Optional[Callable[[str, Exception], None]] = None):
+        self.queue_size = queue_size
+        self.on_error = on_error
+        self.stages: List[PipelineStage] = []
+
+    def add_stage(self, name: str, process: Callable[[Any], Any],
+                  pace: Optional[Callable[[], None]] = None,
+                  on_drop: Optional[Callable[[Any], None]] = None) -> PipelineStage:
+        """
+        Appends a stage. The first stage is the source (paced by `pace`);
+        every later stage reads from a queue fed by the stage before it.
+        `on_drop` gets the items dropped from that queue before this stage saw them.
+        """
+        input_queue = None
+        if self.stages:
+            input_queue = DropOldestQueue(self.queue_size, on_drop)
+            self.stages[-1].output_queue = input_queue
+
+        stage = PipelineStage(name, process, input_queue, on_error=self.on_error, pace=pace)
+        self.stages.append(stage)
+        return stage
+
+    def start(self):
+        """Starts every stage, last one first so nothing is produced into a dead end."""
+        for stage in reversed(self.stages):
+            stage.start()
+
+    def stop(self):
+        """Stops every stage and waits for them to finish."""
+        for stage in self.stages:
+            stage.stop()
+        for stage in self.stages:
+            stage.join()
+            if stage.input_queue is not None:
+                stage.input_queue.clear()
+
+    def get_metrics(self) -> Dict[str, Dict]:
+        """Metrics of every stage, keyed by stage name."""
+        return {stage.name: stage.get_metrics() for stage in self.stages}
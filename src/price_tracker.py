@@ -4,14 +4,19 @@ import time
 from typing import Dict, Optional
 from datetime import datetime, timedelta
 
+from item_store import ItemStore
+
 class PriceTracker:
     """Tracks and retrieves current Tarkov item prices."""
     
-    def __init__(self, cache_duration_hours: int = 6):
+    def __init__(self, cache_duration_hours: int = 6, items_file: str = "data/items.json"):
         # We'll cache prices to avoid hitting the API too often
         self.price_cache = {}
         self.cache_duration = timedelta(hours=cache_duration_hours)
         
+        # Trader prices from the item database; names are looked up through its ItemCatalog
+        self.store = ItemStore.from_file(items_file)
+        
         # Fallback prices for common items (in case API is down)
         self.fallback_prices = {
             "Graphics Card": {"trader": "Mechanic", "price": 285000},
@@ -32,6 +37,11 @@ class PriceTracker:
             if datetime.now() - cached_data['timestamp'] < self.cache_duration:
                 return cached_data['data']
         
+        # The item database usually knows the price already
+        catalog_price = self.get_catalog_price(item_name)
+        if catalog_price:
+            return catalog_price
+        
         # Try to fetch from API
         api_price = self.fetch_from_api(item_name)
         if api_price:
@@ -45,6 +55,16 @@ class PriceTracker:
         # Fall back to stored prices
         return self.fallback_prices.get(item_name)
     
+    def get_catalog_price(self, item_name: str) -> Optional[Dict]:
+        """
+        Gets the best trader price for an item from the item database.
+        Returns None if the item is unknown or no trader buys it.
+        """
+        index = self.store.find(item_name)
+        if index < 0 or not self.store.trader_prices[index]:
+            return None
+        return {"trader": self.store.traders[index], "price": int(self.store.trader_prices[index])}
+    
     def fetch_from_api(self, item_name: str) -> Optional[Dict]:
         """
         Fetches current price from Tarkov-Market API.
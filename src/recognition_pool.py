@@ -0,0 +1,150 @@
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+from item_recognizer import ItemRecognizer
+
+# Each worker process keeps its own recognizer. Its template banks are views
+# into the same memory-mapped template pack, so the OS shares the pages
+# between processes and nothing big is ever pickled. Workers only open the
+# pack read-only; building and saving it is the parent's job.
+_worker_recognizer = None
+
+class PackUnavailable(RuntimeError):
+    """A worker process couldn't open an up-to-date template pack."""
+
+def _init_worker(settings: Dict):
+    """Creates the recognizer once per worker process."""
+    global _worker_recognizer
+    _worker_recognizer = ItemRecognizer(**settings)
+
+def _recognize_in_worker(job) -> Tuple[Optional[str], Dict[str, int]]:
+    """
+    Recognizes one slot inside a worker process. Also returns how the
+    worker's counters changed, since the parent never sees its recognizer.
+    """
+    image, confidence_threshold, footprint = job
+    if _worker_recognizer.pack_fingerprint is None:
+        raise PackUnavailable("Template pack could not be opened in a worker process")
+    before = _worker_recognizer.get_stats()
+    item_name = _worker_recognizer.recognize_item(image, confidence_threshold, footprint)
+    after = _worker_recognizer.get_stats()
+    return item_name, {key: after[key] - before[key] for key in after}
+
+class RecognitionPool:
+    """
+    Spreads slot recognition across several workers and returns the
+    results in slot order.
+
+    'process' mode uses worker processes that share the template pack through
+    memory mapping. 'thread' mode shares the recognizer directly and relies on
+    NumPy/OpenCV releasing the GIL during the heavy math.
+    """
+
+    def __init__(self, recognizer: ItemRecognizer, workers: Optional[int] = None, mode: str = 'process'):
+        if mode not in ('process', 'thread'):
+            raise ValueError(f"Unknown pool mode '{mode}', expected 'process' or 'thread'")
+
+        self.recognizer = recognizer
+        self.workers = workers or max(1, (os.cpu_count() or 1) - 1)
+        self.mode = mode
+
+        # Without a template pack every worker process would have to decode
+        # all the PNGs itself, so share the one recognizer between threads instead
+        if self.mode == 'process' and not recognizer.pack_path:
+            print("No template pack configured, using a thread pool for recognition")
+            self.mode = 'thread'
+
+        # Workers are started on first use
+        self.executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        """Starts the worker pool if it isn't running yet."""
+        if self.executor is None:
+            if self.mode == 'process' and not self._prepare_pack():
+                print("Template pack isn't available, using a thread pool for recognition")
+                self.mode = 'thread'
+            if self.mode == 'process':
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_init_worker,
+                    initargs=(self.recognizer.get_settings(pack_only=True),)
+                )
+            else:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers)
+            print(f"Started {self.workers} recognition {self.mode} workers")
+        return self.executor
+
+    def _prepare_pack(self) -> bool:
+        """
+        Makes sure the pack on disk matches the current templates before
+        workers open it. If the templates changed since the recognizer loaded
+        (e.g. a database build finished), it reloads here, rebuilding and
+        saving the pack once, so the workers and this process agree.
+        Returns False if there's still no usable pack.
+        """
+        if self.recognizer.pack_ready():
+            return True
+        self.recognizer.load_templates()
+        return self.recognizer.pack_ready()
+
+    def _reset_executor(self):
+        """Throws away a broken worker pool so the next call starts a new one."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def recognize_slots(self, slots: List[dict], confidence_threshold: float = 0.8) -> List[Optional[str]]:
+        """
+        Recognizes every slot and returns the item names (or None) in the same order.
+        """
+        if not slots:
+            return []
+
+        # Not worth the hand-off for a single slot or a single worker
+        if self.workers <= 1 or len(slots) == 1:
+            return self._recognize_here(slots, confidence_threshold)
+
+        executor = self._get_executor()
+
+        if self.mode == 'process':
+            jobs = [(slot['image'], confidence_threshold, slot.get('footprint')) for slot in slots]
+            # Send work in a few chunks per worker to keep the hand-off overhead low
+            chunksize = max(1, len(jobs) // (self.workers * 4))
+            try:
+                results = list(executor.map(_recognize_in_worker, jobs, chunksize=chunksize))
+            except BrokenProcessPool as e:
+                # A worker died; start a fresh pool next time and do this batch here
+                print(f"Recognition worker pool broke ({e}), restarting it")
+                self._reset_executor()
+                return self._recognize_here(slots, confidence_threshold)
+            except PackUnavailable as e:
+                # E.g. the pack changed again while the workers were starting
+                print(f"{e}, using a thread pool for recognition")
+                self._reset_executor()
+                self.mode = 'thread'
+                return self._recognize_here(slots, confidence_threshold)
+            
+            item_names = []
+            for item_name, stats in results:
+                # Keep pruning audits and hash hit counts in the parent's recognizer
+                self.recognizer.merge_stats(stats)
+                item_names.append(item_name)
+            return item_names
+
+        return list(executor.map(
+            lambda slot: self.recognizer.recognize_item(slot['image'], confidence_threshold, slot.get('footprint')),
+            slots
+        ))
+
+    def _recognize_here(self, slots: List[dict], confidence_threshold: float) -> List[Optional[str]]:
+        """Recognizes the slots one after another in the calling thread."""
+        return [
+            self.recognizer.recognize_item(slot['image'], confidence_threshold, slot.get('footprint'))
+            for slot in slots
+        ]
+
+    def close(self):
+        """Stops the worker pool."""
+        self._reset_executor()
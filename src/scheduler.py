@@ -0,0 +1,54 @@
+import threading
+import time
+
+class AdaptiveScheduler:
+    """
+    Decides how long to wait before the next capture.
+
+    While the inventory is open and changing it scans as fast as max_fps
+    allows. Every idle tick (inventory closed or nothing changed) stretches
+    the interval by `backoff`, up to max_interval. Time already spent since
+    the last tick is subtracted from the wait.
+    """
+
+    def __init__(self, max_fps: float = 10.0, max_interval: float = 2.0, backoff: float = 1.5):
+        self.min_interval = 1.0 / max_fps
+        self.max_interval = max_interval
+        self.backoff = backoff
+
+        self.interval = self.min_interval
+        self.last_tick = 0.0
+        self.stats = {'active': 0, 'idle': 0}
+
+        # Set to cut a wait short, e.g. when activity is seen or scanning stops
+        self.wake_event = threading.Event()
+
+    def report_activity(self):
+        """The inventory is open and changing: scan at full speed again."""
+        self.stats['active'] += 1
+        if self.interval > self.min_interval:
+            self.interval = self.min_interval
+            self.wake_event.set()
+
+    def report_idle(self):
+        """Nothing worth scanning happened: back off a bit more."""
+        self.stats['idle'] += 1
+        self.interval = min(self.interval * self.backoff, self.max_interval)
+
+    def wait(self):
+        """Sleeps until the current interval has passed since the last tick."""
+        delay = self.last_tick + self.interval - time.perf_counter()
+        if delay > 0:
+            self.wake_event.wait(delay)
+        self.wake_event.clear()
+        self.last_tick = time.perf_counter()
+
+    def wake(self):
+        """Ends the current wait immediately."""
+        self.wake_event.set()
+
+    def reset(self):
+        """Starts again at full speed."""
+        self.interval = self.min_interval
+        self.last_tick = 0.0
+        self.wake_event.clear()
@@ -12,15 +12,116 @@ try:
 except ImportError:
     PIL_AVAILABLE = False
 
+class FrameRing:
+    """
+    A small ring of preallocated frame buffers, so capturing doesn't
+    allocate a fresh multi-megabyte array every tick.
+    
+    By default a buffer is reused after `size` more frames of the same shape.
+    With `explicit_release`, a buffer stays in use until it's handed back
+    with release() instead, and next_buffer returns None while every buffer
+    is taken, so a frame that is still being read is never overwritten.
+    """
+    
+    def __init__(self, size: int = 3, max_shapes: int = 2, explicit_release: bool = False):
+        self.size = size
+        # Full frames and ROI frames have different shapes, keep a ring for each
+        self.max_shapes = max_shapes
+        self.explicit_release = explicit_release
+        self.rings = {}
+        self.positions = {}
+        # Explicit release: free buffers per shape, and every buffer handed out
+        self.free = {}
+        self.in_use = {}
+        self.lock = threading.Lock()
+        
+    def _ring(self, key, shape, dtype) -> list:
+        """Gets the ring for a shape, allocating it (and evicting an old shape) on first use."""
+        ring = self.rings.pop(key, None)
+        if ring is None:
+            ring = [np.empty(shape, dtype=dtype) for _ in range(self.size)]
+            self.positions[key] = 0
+            self.free[key] = list(ring)
+            # Forget the least recently used shape (e.g. an old ROI size).
+            # Its buffers that are still in use are simply dropped when released.
+            if len(self.rings) >= self.max_shapes:
+                oldest = next(iter(self.rings))
+                del self.rings[oldest]
+                del self.positions[oldest]
+                del self.free[oldest]
+        # Re-insert so the dict order tracks recent use
+        self.rings[key] = ring
+        return ring
+        
+    def has_free(self, shape: Tuple[int, ...], dtype=np.uint8) -> bool:
+        """Whether next_buffer would return a buffer of this shape right now."""
+        if not self.explicit_release:
+            return True
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self.lock:
+            return key not in self.free or bool(self.free[key])
+        
+    def next_buffer(self, shape: Tuple[int, ...], dtype=np.uint8) -> Optional[np.ndarray]:
+        """
+        Returns the next buffer of the given shape, allocating only on first use.
+        With explicit release, returns None if every buffer of that shape is in use.
+        """
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self.lock:
+            ring = self._ring(key, shape, dtype)
+            
+            if self.explicit_release:
+                if not self.free[key]:
+                    return None
+                buffer = self.free[key].pop()
+                self.in_use[id(buffer)] = (key, buffer)
+                return buffer
+            
+            position = self.positions[key]
+            self.positions[key] = (position + 1) % self.size
+            return ring[position]
+        
+    def release(self, buffer: np.ndarray):
+        """Hands a buffer back so it can be captured into again (explicit release only)."""
+        with self.lock:
+            entry = self.in_use.pop(id(buffer), None)
+            if entry is None:
+                return
+            key, buffer = entry
+            # The shape may have been evicted in the meantime
+            if key in self.free:
+                self.free[key].append(buffer)
+
 class ScreenCapture:
     """Handles capturing screenshots of the game screen."""
     
-    def __init__(self):
+    def __init__(self, ring_size: int = 3, release_frames: bool = False):
+        """
+        With `release_frames`, every captured frame must be handed back with
+        release_frame() once nothing reads it anymore; capture_screenshot
+        returns None (and sets frames_busy) while all ring buffers are in use.
+        """
         # We'll create mss instances per thread to avoid threading issues
         self._local = threading.local()
         # We'll store the game window position once we find it
         self.game_window = None
         
+        # Region-of-interest mode: once the inventory is known we only grab
+        # that rectangle (plus a margin), with a full-frame grab every
+        # `full_frame_interval` captures so the grid can be found again.
+        # Coordinates are relative to the game window.
+        self.roi = None
+        self.full_frame_interval = 30
+        self.captures_since_full = 0
+        
+        # Top-left corner (x, y) of the last capture inside the game window
+        self.capture_origin = (0, 0)
+        
+        # Captured frames are written into preallocated buffers
+        self.frame_ring = FrameRing(ring_size, explicit_release=release_frames)
+        # True when the last capture was skipped because every buffer was in use
+        self.frames_busy = False
+        
     def _get_mss_instance(self):
         """Get or create an mss instance for the current thread."""
         if not hasattr(self._local, 'sct'):
@@ -48,28 +149,91 @@ class ScreenCapture:
         print(f"Using monitor: {monitor['width']}x{monitor['height']}")
         return self.game_window
     
+    def set_roi(self, region: Tuple[int, int, int, int], margin: int = 32):
+        """
+        Restricts future captures to a region (x, y, width, height) of the
+        game window, grown by `margin` pixels on every side.
+        """
+        if not self.game_window:
+            return
+            
+        x, y, w, h = region
+        left = max(0, x - margin)
+        top = max(0, y - margin)
+        right = min(self.game_window["width"], x + w + margin)
+        bottom = min(self.game_window["height"], y + h + margin)
+        
+        if right <= left or bottom <= top:
+            self.roi = None
+            return
+            
+        self.roi = {"left": left, "top": top, "width": right - left, "height": bottom - top}
+    
+    def clear_roi(self):
+        """Goes back to capturing the whole game window."""
+        self.roi = None
+        
+    def _next_capture_area(self) -> Tuple[dict, Tuple[int, int]]:
+        """
+        Picks what to grab next: the ROI, or the whole window when there is
+        no ROI or a periodic full frame is due.
+        Returns the mss monitor dict and its origin inside the game window.
+        """
+        # set_roi/clear_roi run on the detection thread and swap in a whole
+        # new dict, so read it once and only use the local copy below
+        roi = self.roi
+        if roi and self.captures_since_full < self.full_frame_interval:
+            self.captures_since_full += 1
+            area = {
+                "top": self.game_window["top"] + roi["top"],
+                "left": self.game_window["left"] + roi["left"],
+                "width": roi["width"],
+                "height": roi["height"]
+            }
+            return area, (roi["left"], roi["top"])
+            
+        self.captures_since_full = 0
+        return self.game_window, (0, 0)
+    
     def capture_screenshot(self) -> Optional[np.ndarray]:
         """
-        Captures a screenshot of the game window.
-        Returns the image as a numpy array or None if failed.
+        Captures a screenshot of the game window, or only of the ROI if one is set.
+        Check capture_origin for where the image sits inside the game window.
+        Returns the image as a BGRA numpy array (BGR from the PIL fallback)
+        or None if failed.
         """
         if not self.game_window:
             print("Game window not found. Run find_game_window first.")
             return None
             
+        area, origin = self._next_capture_area()
+        self.capture_origin = origin
+        
+        # Every buffer is still being read downstream; skip rather than overwrite one
+        self.frames_busy = not self.frame_ring.has_free((area["height"], area["width"], 4))
+        if self.frames_busy:
+            return None
+            
         # Try mss first
         try:
             # Get thread-local mss instance
             sct = self._get_mss_instance()
             
             # Capture the screen
-            screenshot = sct.grab(self.game_window)
+            screenshot = sct.grab(area)
             
-            # Convert to numpy array (this is how OpenCV likes images)
-            img = np.array(screenshot)
-            
-            # Convert from BGRA to BGR color format
-            img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+            # View mss's raw BGRA buffer as a numpy array and copy it straight
+            # into the next ring buffer. The alpha channel is left in place;
+            # detection and recognition ignore it, so there's no full-frame
+            # color conversion either.
+            raw = np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(
+                screenshot.height, screenshot.width, 4
+            )
+            img = self.frame_ring.next_buffer(raw.shape)
+            if img is None:
+                self.frames_busy = True
+                return None
+            np.copyto(img, raw)
             
             return img
             
@@ -83,15 +247,19 @@ class ScreenCapture:
                     # PIL captures the entire screen, so we need to crop to our region
                     pil_img = ImageGrab.grab()
                     pil_img = pil_img.crop((
-                        self.game_window["left"],
-                        self.game_window["top"],
-                        self.game_window["left"] + self.game_window["width"],
-                        self.game_window["top"] + self.game_window["height"]
+                        area["left"],
+                        area["top"],
+                        area["left"] + area["width"],
+                        area["top"] + area["height"]
                     ))
                     
-                    # Convert PIL image to numpy array
-                    img = np.array(pil_img)
-                    img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+                    # Convert the PIL image straight into the next ring buffer
+                    rgb = np.asarray(pil_img.convert('RGB'))
+                    img = self.frame_ring.next_buffer(rgb.shape)
+                    if img is None:
+                        self.frames_busy = True
+                        return None
+                    cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=img)
                     
                     print("PIL fallback successful")
                     return img
@@ -101,6 +269,10 @@ class ScreenCapture:
             
             return None
     
+    def release_frame(self, image: np.ndarray):
+        """Hands a captured frame's buffer back for reuse (see release_frames)."""
+        self.frame_ring.release(image)
+    
     def save_screenshot(self, image: np.ndarray, filename: str):
         """Saves a screenshot to file for debugging."""
         cv2.imwrite(filename, image)
@@ -0,0 +1,226 @@
+import re
+import numpy as np
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Match quality, best first
+RANK_EXACT = 0
+RANK_PREFIX = 1
+RANK_WORD = 2
+RANK_SUBSTRING = 3
+RANK_FUZZY = 4
+
+# A character right after a space, hyphen or bracket starts a new word
+WORD_START = re.compile(r'(?<=[ \-(])[^ \-(]')
+# Length of the sorted prefix keys used for ranking; longer queries are
+# checked against the full text
+PREFIX_KEY_LENGTH = 12
+
+def trigrams(text: str) -> List[str]:
+    """Every 3-character slice of the text."""
+    return [text[i:i + 3] for i in range(len(text) - 2)]
+
+class TrigramIndex:
+    """
+    Search index over item names and short names.
+
+    Every trigram (3-character slice) points at the sorted list of items
+    whose name or short name contains it. A query's candidates are the
+    intersection of its trigrams' lists, which are then checked and ranked:
+    exact match, then prefix, then start of a word, then anywhere.
+    When nothing contains the query, items sharing most of its trigrams
+    are returned as fuzzy matches.
+
+    Ranking never loops over the matches in Python: every name, short name
+    and word start is kept as a sorted prefix key, so the items a query is a
+    prefix of are one binary search away, and the rest is array work.
+    """
+
+    def __init__(self, names: List[str], short_names: List[str],
+                 fuzzy_ratio: float = 0.5, cache_size: int = 64):
+        # Lowercase texts each item is searched by
+        self.names = [name.lower() for name in names]
+        self.short_names = [short_name.lower() for short_name in short_names]
+        self.name_lengths = np.array([len(name) for name in self.names], dtype=np.int32)
+        self.short_name_lengths = np.array([len(name) for name in self.short_names], dtype=np.int32)
+        # Name and short name in one string, so a substring test is one `in`
+        self.texts = [f"{name}\n{short_name}" for name, short_name in zip(self.names, self.short_names)]
+        # Share of the query's trigrams an item needs for a fuzzy match
+        self.fuzzy_ratio = fuzzy_ratio
+
+        postings: Dict[str, List[int]] = {}
+        for index, (name, short_name) in enumerate(zip(self.names, self.short_names)):
+            for gram in set(trigrams(name)) | set(trigrams(short_name)):
+                postings.setdefault(gram, []).append(index)
+        self.postings = {gram: np.array(items, dtype=np.int32) for gram, items in postings.items()}
+
+        # Sorted prefix keys for ranking: (key, item, offset into the text,
+        # 0 for the name or 1 for the short name). Offset 0 is the start of
+        # the text; anything else is the start of a word in the name.
+        entries = []
+        for index, (name, short_name) in enumerate(zip(self.names, self.short_names)):
+            entries.append((name[:PREFIX_KEY_LENGTH], index, 0, 0))
+            if short_name:
+                entries.append((short_name[:PREFIX_KEY_LENGTH], index, 0, 1))
+            for match in WORD_START.finditer(name):
+                offset = match.start()
+                entries.append((name[offset:offset + PREFIX_KEY_LENGTH], index, offset, 0))
+        entries.sort()
+        self.prefix_keys = [entry[0] for entry in entries]
+        self.prefix_items = np.array([entry[1] for entry in entries], dtype=np.int32)
+        self.prefix_offsets = np.array([entry[2] for entry in entries], dtype=np.int32)
+        self.prefix_sources = np.array([entry[3] for entry in entries], dtype=np.int8)
+
+        # Recent query -> ranked results; an extended query only has to check
+        # the results of the query it extends
+        self.cache: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+        self.cache_size = cache_size
+        self.stats = {'cached': 0, 'narrowed': 0, 'indexed': 0, 'scanned': 0}
+
+    def search(self, query: str) -> np.ndarray:
+        """Indices of the items matching the query, best matches first."""
+        query = query.lower().strip()
+        if not query:
+            return np.arange(len(self.names), dtype=np.int32)
+
+        cached = self.cache.get(query)
+        if cached is not None:
+            self.cache.move_to_end(query)
+            self.stats['cached'] += 1
+            return cached
+
+        candidates, verified = self.candidates(query)
+        results = self.rank(query, candidates, verified)
+        if len(results) == 0 and len(query) >= 3:
+            results = self.fuzzy(query)
+
+        self.cache[query] = results
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return results
+
+    def candidates(self, query: str) -> Tuple[np.ndarray, bool]:
+        """
+        Items that might contain the query: the results of a cached query it
+        extends, the intersection of its trigram postings, or (for one or two
+        characters, which have no trigrams) the items that contain it.
+        Also returns whether they are already known to contain it.
+        """
+        previous = self.extended_query(query)
+        # Checking a huge previous result one by one is slower than starting over
+        if previous is not None and len(self.cache[previous]) <= len(self.names) // 4:
+            self.stats['narrowed'] += 1
+            # Back in catalog order, which rank() keeps for plain substring matches
+            return np.sort(self.cache[previous]), False
+
+        if len(query) < 3:
+            # One pass over every item; rank() won't need to check these again
+            self.stats['scanned'] += 1
+            hit = np.fromiter((query in text for text in self.texts), dtype=bool, count=len(self.texts))
+            return np.flatnonzero(hit).astype(np.int32), True
+
+        self.stats['indexed'] += 1
+        lists = []
+        for gram in set(trigrams(query)):
+            items = self.postings.get(gram)
+            if items is None:
+                return np.empty(0, dtype=np.int32), True
+            lists.append(items)
+
+        # Intersect the shortest lists first so the work shrinks quickly
+        lists.sort(key=len)
+        result = lists[0]
+        for items in lists[1:]:
+            result = np.intersect1d(result, items, assume_unique=True)
+            if len(result) == 0:
+                break
+        return result, False
+
+    def extended_query(self, query: str) -> Optional[str]:
+        """
+        The longest cached query that this one extends by typing more
+        characters, if it had substring matches. A name containing the longer
+        query must contain the shorter one, so its results are the candidates.
+        """
+        for length in range(len(query) - 1, 0, -1):
+            previous = query[:length]
+            results = self.cache.get(previous)
+            if results is not None:
+                # Fuzzy results can't be narrowed this way
+                return previous if not self.fuzzy_results(previous) else None
+        return None
+
+    def fuzzy_results(self, query: str) -> bool:
+        """Whether the cached results of a query came from the fuzzy fallback."""
+        results = self.cache[query]
+        if len(results) == 0:
+            return False
+        index = int(results[0])
+        return query not in self.names[index] and query not in self.short_names[index]
+
+    def rank(self, query: str, candidates: np.ndarray, verified: bool = False) -> np.ndarray:
+        """
+        Keeps the candidates that really contain the query (all of them if
+        already verified), best matches first; shorter names first within
+        the exact, prefix and word ranks.
+        """
+        if not verified:
+            texts = self.texts
+            indices = candidates.tolist()
+            hit = np.fromiter((query in texts[i] for i in indices), dtype=bool, count=len(indices))
+            candidates = candidates[hit]
+
+        ranks = np.full(len(self.names), RANK_SUBSTRING, dtype=np.int8)
+        items, offsets, exact = self.prefixed_by(query)
+        # Worst rank first so better ones overwrite it
+        ranks[items[offsets > 0]] = RANK_WORD
+        ranks[items[offsets == 0]] = RANK_PREFIX
+        ranks[items[exact]] = RANK_EXACT
+
+        # Only the exact, prefix and word matches (the ones at the top of the
+        # list) are sorted; plain substring matches, usually the bulk of a
+        # short query's results, follow in catalog order
+        candidate_ranks = ranks[candidates]
+        better = candidate_ranks < RANK_SUBSTRING
+        top = candidates[better]
+        order = np.lexsort((top, self.name_lengths[top], candidate_ranks[better]))
+        return np.concatenate((top[order], candidates[~better])).astype(np.int32)
+
+    def prefixed_by(self, query: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        The (item, offset, exact match) of every name, short name and word
+        start the query is a prefix of, from a binary search over the sorted keys.
+        """
+        key = query[:PREFIX_KEY_LENGTH]
+        start = bisect_left(self.prefix_keys, key)
+        end = bisect_left(self.prefix_keys, key + '\U0010ffff', start)
+        items = self.prefix_items[start:end]
+        offsets = self.prefix_offsets[start:end]
+        sources = self.prefix_sources[start:end]
+
+        if len(query) > PREFIX_KEY_LENGTH:
+            # The keys are truncated, so check the rest against the full text
+            keep = np.fromiter(
+                ((self.short_names[i] if source else self.names[i]).startswith(query, offset)
+                 for i, offset, source in zip(items.tolist(), offsets.tolist(), sources.tolist())),
+                dtype=bool, count=len(items)
+            )
+            items, offsets, sources = items[keep], offsets[keep], sources[keep]
+
+        lengths = np.where(sources == 1, self.short_name_lengths[items], self.name_lengths[items])
+        exact = (offsets == 0) & (lengths == len(query))
+        return items, offsets, exact
+
+    def fuzzy(self, query: str) -> np.ndarray:
+        """Items sharing at least fuzzy_ratio of the query's trigrams, most shared first."""
+        grams = set(trigrams(query))
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not lists:
+            return np.empty(0, dtype=np.int32)
+
+        items, counts = np.unique(np.concatenate(lists), return_counts=True)
+        keep = counts >= max(1, int(np.ceil(len(grams) * self.fuzzy_ratio)))
+        items, counts = items[keep], counts[keep]
+        order = np.argsort(-counts, kind='stable')
+        return items[order].astype(np.int32)
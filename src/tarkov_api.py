@@ -1,157 +1,465 @@
-import requests
+import aiohttp
+import asyncio
+import concurrent.futures
 import json
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 import os
+import sys
+import threading
 import time
 
-class TarkovDevAPI:
+# Make sibling modules importable however this module was imported
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from image_metadata import ImageMetadataStore
+from item_catalog import ItemCatalog
+
+# The tarkov.dev GraphQL endpoint
+DEFAULT_API_URL = "https://api.tarkov.dev/graphql"
+
+# Item fields that only change with game patches (the "catalog")
+CATALOG_FIELDS = """
+    id
+    name
+    shortName
+    normalizedName
+    iconLink
+    gridImageLink
+    basePrice
+    width
+    height
+"""
+
+# Item fields that change all the time (the prices)
+PRICE_FIELDS = """
+    id
+    avg24hPrice
+    low24hPrice
+    high24hPrice
+    lastLowPrice
+    sellFor {
+        source
+        price
+        currency
+        priceRUB
+        vendor {
+            name
+            normalizedName
+        }
+    }
+"""
+
+def merge_prices(catalog: ItemCatalog, prices: List[Dict]) -> int:
     """
-    Interfaces with the tarkov.dev GraphQL API to fetch item data.
-    This class handles querying, caching, and rate limiting.
+    Copies price fields from a price refresh into catalog items, matched by id.
+    Returns how many items were updated.
+    """
+    merged = 0
+    for price in prices:
+        item = catalog.get_by_id(price["id"])
+        if item is not None:
+            item.update(price)
+            merged += 1
+    return merged
+
+def best_trader_price(item: Dict) -> Optional[Dict]:
     """
+    Finds which trader offers the most money for an item (from its sellFor list).
+    Returns {"price", "trader", "currency"} or None if no trader buys it.
+    """
+    if "sellFor" not in item:
+        return None
+        
+    best_price = 0
+    best_trader = None
     
-    def __init__(self, cache_dir: str = "data/cache"):
-        # The tarkov.dev GraphQL endpoint
-        self.api_url = "https://api.tarkov.dev/graphql"
+    # Look through all trader prices
+    for sell_option in item["sellFor"]:
+        # We're interested in trader prices (not flea market)
+        if sell_option["source"] == "trader":
+            price_rub = sell_option.get("priceRUB", 0)
+            if price_rub > best_price:
+                best_price = price_rub
+                best_trader = sell_option
+                
+    if best_trader:
+        return {
+            "price": best_price,
+            "trader": best_trader["vendor"]["name"],
+            "currency": best_trader["currency"]
+        }
         
-        # Cache directory for storing item data and images
+    return None
+
+class TokenBucket:
+    """
+    Async rate limiter shared by every request of a client.
+    Tokens refill at `rate` per second up to `capacity`; each request takes one,
+    so short bursts go out at once while the long-run rate stays bounded.
+    """
+    
+    def __init__(self, rate: float = 10.0, capacity: int = 10):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = None
+        
+    async def acquire(self):
+        """Waits until a token is available and takes it."""
+        # Created lazily so it belongs to the loop that uses it
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+            
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class AsyncTarkovDevAPI:
+    """
+    Asynchronous tarkov.dev client.
+    All requests share one pooled HTTP session (so connections are reused
+    instead of paying for TCP/TLS setup every time) and one token bucket.
+    """
+    
+    def __init__(self, cache_dir: str = "data/cache", api_url: str = DEFAULT_API_URL,
+                 requests_per_second: float = 10.0, max_connections: int = 8):
+        # api_url can point at a local stub server for testing
+        self.api_url = api_url
         self.cache_dir = cache_dir
-        self.ensure_cache_dirs()
+        self.max_connections = max_connections
+        self.rate_limiter = TokenBucket(requests_per_second, max_connections)
+        self.session: Optional[aiohttp.ClientSession] = None
         
-        # In-memory cache for quick access
-        self.item_cache = {}
-        self.last_full_update = None
+        # URL, ETag, Last-Modified and content hash of every cached image
+        self.image_metadata = ImageMetadataStore(os.path.join(cache_dir, "images", "index.json"))
         
-        # Rate limiting - tarkov.dev is generous but we should be respectful
-        self.last_request_time = 0
-        self.min_request_interval = 0.1  # 100ms between requests
+    async def __aenter__(self):
+        return self
         
-    def ensure_cache_dirs(self):
-        """Creates necessary cache directories if they don't exist."""
-        # Create directory structure for caching
-        os.makedirs(self.cache_dir, exist_ok=True)
-        os.makedirs(os.path.join(self.cache_dir, "images"), exist_ok=True)
-        os.makedirs(os.path.join(self.cache_dir, "data"), exist_ok=True)
+    async def __aexit__(self, *exc_info):
+        await self.close()
         
-    def rate_limit(self):
-        """Ensures we don't hammer the API with too many requests."""
-        # Calculate time since last request
-        time_since_last = time.time() - self.last_request_time
+    def get_session(self) -> aiohttp.ClientSession:
+        """Creates the pooled session on first use (it must be made inside the running loop)."""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=10)
+            )
+        return self.session
         
-        # If we're requesting too fast, wait a bit
-        if time_since_last < self.min_request_interval:
-            sleep_time = self.min_request_interval - time_since_last
-            time.sleep(sleep_time)
-            
-        # Update last request time
-        self.last_request_time = time.time()
+    async def close(self):
+        """Closes the session and its pooled connections, and saves the image metadata."""
+        self.image_metadata.save()
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
         
-    def execute_query(self, query: str, variables: Dict = None) -> Optional[Dict]:
+    async def execute_query(self, query: str, variables: Dict = None) -> Optional[Dict]:
         """
         Executes a GraphQL query against the tarkov.dev API.
         
         Think of this as sending a very specific request to the librarian,
         asking for exactly the information we need.
         """
-        self.rate_limit()
         payload = {"query": query}
         if variables:
             payload["variables"] = variables
         max_retries = 3
         for attempt in range(1, max_retries + 1):
+            await self.rate_limiter.acquire()
             try:
-                response = requests.post(
-                    self.api_url,
-                    json=payload,
-                    headers={"Content-Type": "application/json"},
-                    timeout=10
-                )
-                response.raise_for_status()
-                data = response.json()
+                async with self.get_session().post(self.api_url, json=payload) as response:
+                    response.raise_for_status()
+                    data = await response.json(content_type=None)
+                if not isinstance(data, dict):
+                    raise ValueError(f"expected a JSON object, got {type(data).__name__}")
                 if "errors" in data:
                     print(f"GraphQL errors: {data['errors']}")
                     return None
                 return data.get("data")
-            except requests.exceptions.Timeout:
+            except asyncio.TimeoutError:
                 print(f"[DIAG] Timeout occurred on attempt {attempt} for API request.")
-            except requests.exceptions.RequestException as e:
+            except aiohttp.ClientError as e:
                 print(f"[DIAG] Error querying tarkov.dev on attempt {attempt}: {e}")
+            except ValueError as e:
+                # A 200 that isn't JSON, e.g. a proxy or Cloudflare HTML page
+                print(f"[DIAG] Invalid response from tarkov.dev on attempt {attempt}: {e}")
             if attempt < max_retries:
                 print(f"[DIAG] Retrying API request (attempt {attempt + 1})...")
         print("[DIAG] All attempts to query tarkov.dev failed.")
         return None
+        
+    async def fetch_catalog(self) -> List[Dict]:
+        """
+        Fetches the static part of every item: names, image URLs and size.
+        This only changes with game patches, so it's fetched rarely.
+        """
+        print("Fetching item catalog from tarkov.dev...")
+        result = await self.execute_query("{ items {" + CATALOG_FIELDS + "} }")
+        
+        if result and "items" in result:
+            items = result["items"]
+            print(f"Fetched {len(items)} catalog items from tarkov.dev")
+            return items
+        else:
+            print("Failed to fetch item catalog from tarkov.dev")
+            return []
             
-    def fetch_all_items(self) -> List[Dict]:
+    async def fetch_prices(self, ids: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Fetches only the id and price fields, for every item or just the given ids.
+        This is the small, frequent refresh.
+        """
+        if ids is not None:
+            query = "query ($ids: [ID]) { items(ids: $ids) {" + PRICE_FIELDS + "} }"
+            result = await self.execute_query(query, {"ids": list(ids)})
+        else:
+            result = await self.execute_query("{ items {" + PRICE_FIELDS + "} }")
+            
+        if result and "items" in result:
+            prices = result["items"]
+            print(f"Fetched prices for {len(prices)} items from tarkov.dev")
+            return prices
+        else:
+            print("Failed to fetch prices from tarkov.dev")
+            return []
+            
+    async def fetch_all_items(self) -> List[Dict]:
         """
         Fetches all items from tarkov.dev with their prices and image URLs.
         This is like asking for the entire item catalog.
+        The catalog and the prices are requested at the same time and merged.
         """
-        print("Fetching all items from tarkov.dev...")
-        
-        # This GraphQL query is like a detailed shopping list
-        # We're asking for specific fields we need for our scanner
-        query = """
-        {
-            items {
-                id
-                name
-                shortName
-                normalizedName
-                iconLink
-                gridImageLink
-                basePrice
-                width
-                height
-                avg24hPrice
-                low24hPrice
-                high24hPrice
-                lastLowPrice
-                sellFor {
-                    source
-                    price
-                    currency
-                    priceRUB
-                    vendor {
-                        name
-                        normalizedName
-                    }
-                }
-            }
-        }
+        items, prices = await asyncio.gather(self.fetch_catalog(), self.fetch_prices())
+        merge_prices(ItemCatalog(items), prices)
+        return items
+        
+    def image_path(self, item_name: str) -> str:
+        """Where an item's image is cached."""
+        # Create a safe filename from the item name
+        safe_filename = "".join(c for c in item_name if c.isalnum() or c in "- ").strip()
+        return os.path.join(self.cache_dir, "images", f"{safe_filename}.png")
+        
+    async def download_item_image(self, item_name: str, image_url: str, revalidate: bool = False) -> Optional[str]:
         """
+        Downloads and caches an item's image.
+        Returns the local path to the cached image.
+        """
+        image_path, _ = await self.fetch_item_image(item_name, image_url, revalidate)
+        return image_path
         
-        # Execute the query
-        result = self.execute_query(query)
+    async def fetch_item_image(self, item_name: str, image_url: str,
+                               revalidate: bool = False) -> Tuple[Optional[str], bool]:
+        """
+        Makes sure an item's image is cached and returns (local path, changed).
         
-        if result and "items" in result:
-            items = result["items"]
-            print(f"Fetched {len(items)} items from tarkov.dev")
+        Without revalidate a cached image is used as-is. With revalidate the
+        server is asked with a conditional request, so an unchanged image only
+        costs a 304 and no bytes. `changed` is True when new content was written.
+        """
+        if not image_url:
+            return None, False
+            
+        image_path = self.image_path(item_name)
+        
+        # If we already have the image, return its path
+        if os.path.exists(image_path) and not revalidate:
+            return image_path, False
+            
+        headers = self.image_metadata.conditional_headers(image_path, image_url)
+        
+        await self.rate_limiter.acquire()
+        try:
+            # Download the image (or find out it hasn't changed)
+            async with self.get_session().get(image_url, headers=headers) as response:
+                if response.status == 304:
+                    return image_path, False
+                response.raise_for_status()
+                content = await response.read()
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+                
+            sha256 = self.image_metadata.content_hash(content)
+            entry = self.image_metadata.get(image_path, image_url)
+            previous = entry['sha256'] if entry else self.image_metadata.file_hash(image_path)
+            changed = previous != sha256
             
-            # Cache the results
-            self._cache_items(items)
+            # Only touch the file if the content is new, so the templates built
+            # from it (and the compiled template pack) stay valid otherwise
+            if changed:
+                print(f"Downloaded image for {item_name}")
+                with open(image_path, "wb") as f:
+                    f.write(content)
+            self.image_metadata.update(image_path, image_url, etag, last_modified, sha256)
+                
+            return image_path, changed
             
+        except Exception as e:
+            print(f"Error downloading image for {item_name}: {e}")
+            return (image_path if os.path.exists(image_path) else None), False
+            
+    async def download_item_images(self, images: List[Tuple[str, str]],
+                                   revalidate: bool = False) -> Dict[str, Optional[str]]:
+        """
+        Downloads many (item name, image URL) pairs concurrently.
+        The token bucket keeps the overall request rate in check.
+        Returns item name -> local path (or None if the download failed).
+        """
+        paths = await asyncio.gather(*(
+            self.download_item_image(item_name, image_url, revalidate) for item_name, image_url in images
+        ))
+        return {item_name: path for (item_name, _), path in zip(images, paths)}
+
+class TarkovDevAPI:
+    """
+    Interfaces with the tarkov.dev GraphQL API to fetch item data.
+    This class handles caching; the network work is done by an
+    AsyncTarkovDevAPI running on a background event loop.
+    """
+    
+    def __init__(self, cache_dir: str = "data/cache", api_url: str = DEFAULT_API_URL):
+        self.api_url = api_url
+        
+        # Cache directory for storing item data and images
+        self.cache_dir = cache_dir
+        self.ensure_cache_dirs()
+        
+        # In-memory cache for quick access
+        self.catalog = ItemCatalog()
+        self.last_full_update = None
+        
+        # The static catalog (names, images, sizes) is only fetched again after
+        # this long; in between only prices are refreshed
+        self.catalog_max_age = timedelta(days=1)
+        self.catalog_time: Optional[datetime] = None
+        
+        # Rate limiting - tarkov.dev is generous but we should be respectful (10 requests/s)
+        self.async_api = AsyncTarkovDevAPI(cache_dir, api_url, requests_per_second=10.0)
+        
+        # Event loop thread the async client runs on, started on first use
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread: Optional[threading.Thread] = None
+        
+    def ensure_cache_dirs(self):
+        """Creates necessary cache directories if they don't exist."""
+        # Create directory structure for caching
+        os.makedirs(self.cache_dir, exist_ok=True)
+        os.makedirs(os.path.join(self.cache_dir, "images"), exist_ok=True)
+        os.makedirs(os.path.join(self.cache_dir, "data"), exist_ok=True)
+        
+    def submit(self, coroutine) -> concurrent.futures.Future:
+        """Schedules a coroutine on the background event loop without waiting for it."""
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            self.loop_thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+            self.loop_thread.start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        
+    def run(self, coroutine):
+        """Runs a coroutine on the background event loop and waits for its result."""
+        return self.submit(coroutine).result()
+        
+    def close(self):
+        """Closes the HTTP session and stops the background event loop."""
+        if self.loop is None:
+            return
+        self.run(self.async_api.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join(timeout=2)
+        self.loop.close()
+        self.loop = None
+        self.loop_thread = None
+        
+    def execute_query(self, query: str, variables: Dict = None) -> Optional[Dict]:
+        """Executes a GraphQL query against the tarkov.dev API."""
+        return self.run(self.async_api.execute_query(query, variables))
+        
+    def fetch_all_items(self) -> List[Dict]:
+        """
+        Fetches all items from tarkov.dev with their prices and image URLs,
+        and caches them.
+        If the cached catalog is recent enough only the prices are fetched
+        and merged into it; otherwise the full catalog is fetched too.
+        """
+        items = self.load_catalog()
+        if items is None:
+            items = self.run(self.async_api.fetch_all_items())
+            if items:
+                # Cache the results
+                self._cache_items(items, catalog_time=datetime.now())
             return items
-        else:
-            print("Failed to fetch items from tarkov.dev")
+            
+        prices = self.run(self.async_api.fetch_prices())
+        if not prices:
             return []
+        merge_prices(ItemCatalog(items), prices)
+        self._cache_items(items)
+        return items
+        
+    def refresh_prices(self, ids: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Fetches fresh prices (for every item, or only the given ids) and merges
+        them into the cached catalog. Returns the updated items.
+        """
+        if not self.catalog:
+            return self.fetch_all_items()
             
-    def _cache_items(self, items: List[Dict]):
+        prices = self.run(self.async_api.fetch_prices(ids))
+        merged = merge_prices(self.catalog, prices)
+        if merged:
+            self._cache_items(self.catalog.records)
+        return self.catalog.records
+        
+    def load_catalog(self) -> Optional[List[Dict]]:
+        """
+        Returns the items from the disk cache if the catalog part of it is
+        younger than catalog_max_age, so only prices need refreshing.
+        """
+        cache_file = os.path.join(self.cache_dir, "data", "all_items.json")
+        if not os.path.exists(cache_file):
+            return None
+            
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            catalog_time = datetime.fromisoformat(data.get("catalog_timestamp", data["timestamp"]))
+            if datetime.now() - catalog_time > self.catalog_max_age:
+                print("Item catalog is too old, will fetch it again")
+                return None
+            self.catalog_time = catalog_time
+            return data["items"]
+            
+        except Exception as e:
+            print(f"Error loading item catalog: {e}")
+            return None
+            
+    def _cache_items(self, items: List[Dict], catalog_time: Optional[datetime] = None):
         """
         Caches item data both in memory and on disk.
         This is like organizing our library for quick access later.
+        catalog_time is when the static catalog was fetched (now, for a full fetch).
         """
-        # Update in-memory cache
-        for item in items:
-            self.item_cache[item["name"]] = item
-            # Also cache by normalized name for flexibility
-            self.item_cache[item["normalizedName"]] = item
+        # Update in-memory cache, indexed by id, name, normalized name and short name
+        self.catalog = ItemCatalog(items)
+            
+        if catalog_time is not None:
+            self.catalog_time = catalog_time
             
         # Save to disk for persistence
         cache_file = os.path.join(self.cache_dir, "data", "all_items.json")
         with open(cache_file, "w", encoding="utf-8") as f:
             json.dump({
                 "timestamp": datetime.now().isoformat(),
+                "catalog_timestamp": (self.catalog_time or datetime.now()).isoformat(),
                 "items": items
             }, f, indent=2, ensure_ascii=False)
             
@@ -180,9 +488,8 @@ class TarkovDevAPI:
                 
             # Load items into memory
             items = data["items"]
-            for item in items:
-                self.item_cache[item["name"]] = item
-                self.item_cache[item["normalizedName"]] = item
+            self.catalog = ItemCatalog(items)
+            self.catalog_time = datetime.fromisoformat(data.get("catalog_timestamp", data["timestamp"]))
                 
             self.last_full_update = cache_time
             print(f"Loaded {len(items)} items from cache")
@@ -197,82 +504,43 @@ class TarkovDevAPI:
         Gets item data by name, using cache if available.
         This is like looking up a specific book by its title.
         """
+        self.ensure_items_loaded()
+        
+        # Exact name first, then normalized name, then short name
+        return self.catalog.find(name)
+        
+    def get_item_by_id(self, item_id: str) -> Optional[Dict]:
+        """Gets item data by its tarkov.dev id."""
+        self.ensure_items_loaded()
+        return self.catalog.get_by_id(item_id)
+        
+    def ensure_items_loaded(self):
+        """Loads the items from the disk cache, or the API if there is none."""
         # Check if we have data loaded
-        if not self.item_cache:
+        if not self.catalog:
             # Try to load from cache first
             if not self.load_cache():
                 # If no cache, fetch from API
                 self.fetch_all_items()
-                
-        # Look up the item (try exact match first, then normalized)
-        item = self.item_cache.get(name)
-        if not item:
-            # Try normalized name (lowercase, no spaces)
-            normalized = name.lower().replace(" ", "-")
-            item = self.item_cache.get(normalized)
-            
-        return item
         
-    def download_item_image(self, item_name: str, image_url: str) -> Optional[str]:
+    def download_item_image(self, item_name: str, image_url: str, revalidate: bool = False) -> Optional[str]:
         """
         Downloads and caches an item's image.
         Returns the local path to the cached image.
         """
-        if not image_url:
-            return None
-            
-        # Create a safe filename from the item name
-        safe_filename = "".join(c for c in item_name if c.isalnum() or c in "- ").strip()
-        image_path = os.path.join(self.cache_dir, "images", f"{safe_filename}.png")
+        return self.run(self.async_api.download_item_image(item_name, image_url, revalidate))
+        
+    def download_item_images(self, images: List[Tuple[str, str]],
+                             revalidate: bool = False) -> Dict[str, Optional[str]]:
+        """Downloads many (item name, image URL) pairs concurrently."""
+        return self.run(self.async_api.download_item_images(images, revalidate))
         
-        # If we already have the image, return its path
-        if os.path.exists(image_path):
-            return image_path
-            
-        try:
-            # Download the image
-            print(f"Downloading image for {item_name}...")
-            response = requests.get(image_url, stream=True)
-            response.raise_for_status()
-            
-            # Save the image
-            with open(image_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-                    
-            print(f"Saved image to {image_path}")
-            return image_path
-            
-        except Exception as e:
-            print(f"Error downloading image for {item_name}: {e}")
-            return None
-            
     def get_best_trader_price(self, item_name: str) -> Optional[Dict]:
         """
         Gets the best trader price for an item.
         This finds which trader offers the most money for your item.
         """
         item = self.get_item_by_name(item_name)
-        if not item or "sellFor" not in item:
+        if not item:
             return None
-            
-        best_price = 0
-        best_trader = None
-        
-        # Look through all trader prices
-        for sell_option in item["sellFor"]:
-            # We're interested in trader prices (not flea market)
-            if sell_option["source"] == "trader":
-                price_rub = sell_option.get("priceRUB", 0)
-                if price_rub > best_price:
-                    best_price = price_rub
-                    best_trader = sell_option
-                    
-        if best_trader:
-            return {
-                "price": best_price,
-                "trader": best_trader["vendor"]["name"],
-                "currency": best_trader["currency"]
-            }
-            
-        return None
\ No newline at end of file
+        return best_trader_price(item)
\ No newline at end of file
@@ -0,0 +1,133 @@
+import cv2
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+# Stage-one metrics understood by TemplateBank.candidates
+COARSE_METRICS = ('gray', 'histogram', 'combined')
+
+class TemplateBank:
+    """
+    Holds every item template pre-resized to one slot size and stacked into a
+    single contiguous array, so a slot can be scored against all of them at once.
+    """
+
+    def __init__(self, size: Tuple[int, int]):
+        # (width, height) in pixels, same order cv2.resize expects
+        self.size = size
+        self.names: List[str] = []
+        self.vectors = np.empty((0, size[0] * size[1] * 3), dtype=np.float32)
+
+        # Tiny signatures used to prune candidates before the full match
+        self.gray_signatures = np.empty((0, 64), dtype=np.float32)
+        self.color_signatures = np.empty((0, 64), dtype=np.float32)
+
+    @classmethod
+    def from_arrays(cls, size: Tuple[int, int], names: List[str], vectors: np.ndarray,
+                    gray_signatures: np.ndarray, color_signatures: np.ndarray) -> 'TemplateBank':
+        """
+        Recreates a bank from already prepared arrays, e.g. views into a template pack.
+        """
+        bank = cls(size)
+        bank.names = list(names)
+        bank.vectors = vectors
+        bank.gray_signatures = gray_signatures
+        bank.color_signatures = color_signatures
+        return bank
+
+    @staticmethod
+    def prepare(image: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+        """
+        Turns an image into a zero-mean, unit-length vector.
+        The dot product of two prepared vectors is exactly what
+        cv2.matchTemplate returns for TM_CCOEFF_NORMED on same-sized images.
+        """
+        if image.shape[1] != size[0] or image.shape[0] != size[1]:
+            image = cv2.resize(image, size)
+
+        # Subtract the per-channel mean, like TM_CCOEFF does for color images
+        pixels = image.astype(np.float32).reshape(-1, 3)
+        pixels -= pixels.mean(axis=0)
+        vector = pixels.ravel()
+
+        # A flat, single-color image has no pattern to correlate with
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    @staticmethod
+    def signature(image: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Computes the coarse stage-one signature of an image:
+        an 8x8 grayscale thumbnail and a 4x4x4 color histogram,
+        both normalized so a dot product gives a similarity score.
+        """
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        thumb = cv2.resize(gray, (8, 8), interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+        thumb -= thumb.mean()
+        norm = np.linalg.norm(thumb)
+        if norm > 0:
+            thumb /= norm
+
+        hist = cv2.calcHist([image], [0, 1, 2], None, [4, 4, 4], [0, 256, 0, 256, 0, 256]).ravel()
+        norm = np.linalg.norm(hist)
+        if norm > 0:
+            hist /= norm
+
+        return thumb, hist
+
+    def build(self, templates: Dict[str, np.ndarray]):
+        """
+        Resizes and normalizes every template once and stacks them row by row.
+        """
+        self.names = list(templates.keys())
+        self.vectors = np.empty((len(self.names), self.size[0] * self.size[1] * 3), dtype=np.float32)
+
+        self.gray_signatures = np.empty((len(self.names), 64), dtype=np.float32)
+        self.color_signatures = np.empty((len(self.names), 64), dtype=np.float32)
+
+        for row, name in enumerate(self.names):
+            self.vectors[row] = self.prepare(templates[name], self.size)
+            self.gray_signatures[row], self.color_signatures[row] = self.signature(templates[name])
+
+    def candidates(self, slot_image: np.ndarray, count: int, metric: str = 'combined') -> np.ndarray:
+        """
+        Stage one: ranks every template by its tiny signature and returns
+        the row indices of the best `count` candidates.
+        """
+        if metric not in COARSE_METRICS:
+            raise ValueError(f"Unknown coarse metric '{metric}', expected one of {COARSE_METRICS}")
+
+        thumb, hist = self.signature(slot_image)
+        if metric == 'gray':
+            scores = self.gray_signatures @ thumb
+        elif metric == 'histogram':
+            scores = self.color_signatures @ hist
+        else:
+            scores = self.gray_signatures @ thumb + self.color_signatures @ hist
+
+        if count >= len(scores):
+            return np.arange(len(scores))
+        return np.argpartition(scores, -count)[-count:]
+
+    def score(self, slot_image: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Scores a slot against every template (or only `rows`) in one
+        matrix-vector product. Returns one TM_CCOEFF_NORMED score per row.
+        """
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        return vectors @ self.prepare(slot_image, self.size)
+
+    def best_match(self, slot_image: np.ndarray,
+                   rows: Optional[np.ndarray] = None) -> Tuple[Optional[str], float]:
+        """
+        Returns the best matching template name and its score,
+        optionally searching only the given rows.
+        """
+        if not self.names or (rows is not None and len(rows) == 0):
+            return None, 0.0
+
+        scores = self.score(slot_image, rows)
+        best = int(np.argmax(scores))
+        row = best if rows is None else int(rows[best])
+        return self.names[row], float(scores[best])
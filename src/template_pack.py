@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+# Arrays in the pack start on this boundary so every view is properly aligned
+ALIGNMENT = 64
+
+def source_fingerprint(templates_path: str, extra_files=(), settings: Dict = None) -> str:
+    """
+    Fingerprints the template sources: name, size and modification time of
+    every PNG/JSON in the templates folder, any extra files, and the settings
+    that change how templates are preprocessed.
+    Any change means the compiled pack is stale.
+    """
+    digest = hashlib.sha1()
+
+    entries = []
+    with os.scandir(templates_path) as it:
+        for entry in it:
+            if entry.name.endswith(('.png', '.json')):
+                stat = entry.stat()
+                entries.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    for path in extra_files:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            entries.append((path, stat.st_size, stat.st_mtime_ns))
+
+    for name, size, mtime in sorted(entries):
+        digest.update(f"{name}\0{size}\0{mtime}\n".encode('utf-8'))
+    digest.update(json.dumps(settings or {}, sort_keys=True).encode('utf-8'))
+
+    return digest.hexdigest()
+
+def mapping_hash(mapping: Dict) -> str:
+    """
+    Hash of a JSON-serializable mapping, independent of key order.
+    Lets a fingerprint depend on what a file says rather than when it was written.
+    """
+    return hashlib.sha1(json.dumps(mapping, sort_keys=True).encode('utf-8')).hexdigest()
+
+def write_pack(pack_path: str, arrays: Dict[str, np.ndarray], meta: Dict):
+    """
+    Writes arrays into one flat binary file (<pack_path>.bin) with a JSON
+    index next to it (<pack_path>.json) describing where each array lives.
+    Both files are written to temporary names first and then swapped in.
+    """
+    os.makedirs(os.path.dirname(pack_path) or '.', exist_ok=True)
+
+    entries = {}
+    offset = 0
+    with open(pack_path + '.bin.tmp', 'wb') as f:
+        for key, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            padding = -offset % ALIGNMENT
+            f.write(b'\0' * padding)
+            offset += padding
+
+            entries[key] = {
+                'dtype': array.dtype.str,
+                'shape': list(array.shape),
+                'offset': offset
+            }
+            f.write(array.tobytes())
+            offset += array.nbytes
+
+    with open(pack_path + '.json.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'meta': meta, 'arrays': entries}, f, ensure_ascii=False)
+
+    os.replace(pack_path + '.bin.tmp', pack_path + '.bin')
+    os.replace(pack_path + '.json.tmp', pack_path + '.json')
+
+def read_pack(pack_path: str) -> Optional[Tuple[Dict[str, np.ndarray], Dict]]:
+    """
+    Opens a pack written by write_pack with a single read-only memory map.
+    Arrays are returned as views into the map, so their pages are only read
+    from disk when they are first touched.
+    Returns (arrays, meta) or None if the pack is missing or unreadable.
+    """
+    index_path = pack_path + '.json'
+    bin_path = pack_path + '.bin'
+    if not os.path.exists(index_path) or not os.path.exists(bin_path):
+        return None
+
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+
+        arrays = {}
+        if os.path.getsize(bin_path) > 0:
+            blob = np.memmap(bin_path, dtype=np.uint8, mode='r')
+            for key, entry in index['arrays'].items():
+                dtype = np.dtype(entry['dtype'])
+                shape = tuple(entry['shape'])
+                count = int(np.prod(shape)) if shape else 1
+                start = entry['offset']
+                arrays[key] = blob[start:start + count * dtype.itemsize].view(dtype).reshape(shape)
+
+        return arrays, index['meta']
+
+    except Exception as e:
+        print(f"Error reading template pack {pack_path}: {e}")
+        return None
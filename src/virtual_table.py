@@ -0,0 +1,191 @@
+from tkinter import ttk
+from typing import Callable, Optional, Sequence
+
+class VirtualTable:
+    """
+    Shows a long list in a ttk.Treeview without inserting every row.
+
+    The tree holds a fixed pool of rows, enough for the viewport plus a few
+    overscan rows. Scrolling doesn't move the tree; it changes which data
+    positions the pool shows and rewrites those rows' values, so a repaint
+    costs one Tk call per visible row no matter how long the list is.
+    The scrollbar, mouse wheel and arrow keys all drive that offset.
+    """
+
+    def __init__(self, tree: ttk.Treeview, scrollbar: ttk.Scrollbar,
+                 on_select: Optional[Callable[[int], None]] = None, overscan: int = 5):
+        """
+        on_select(position) is called when the user selects a row, with the
+        row's position in the list (not a tree item id).
+        """
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.on_select = on_select
+        self.overscan = overscan
+
+        # The list being shown: its length and how to get a row's values
+        self.count = 0
+        self.row_values: Callable[[int], Sequence] = lambda position: ()
+
+        # Position of the first visible row, and of the selected row if any
+        self.offset = 0
+        self.selected: Optional[int] = None
+
+        # Pool of reusable tree rows; pool[i] shows position offset + i
+        self.pool = []
+        self.attached = 0
+        # Rows that fit in the tree, measured once it's on screen
+        self.visible = int(tree.cget('height'))
+
+        tree.configure(selectmode='browse')
+        scrollbar.configure(command=self.yview)
+        tree.bind('<Configure>', self.on_resize)
+        tree.bind('<<TreeviewSelect>>', self.on_tree_select)
+        tree.bind('<MouseWheel>', self.on_mouse_wheel)
+        tree.bind('<Button-4>', lambda e: self.scroll(-3))
+        tree.bind('<Button-5>', lambda e: self.scroll(3))
+        tree.bind('<Up>', lambda e: self.move_selection(-1))
+        tree.bind('<Down>', lambda e: self.move_selection(1))
+        tree.bind('<Prior>', lambda e: self.move_selection(-self.visible))
+        tree.bind('<Next>', lambda e: self.move_selection(self.visible))
+        tree.bind('<Home>', lambda e: self.move_selection(-self.count))
+        tree.bind('<End>', lambda e: self.move_selection(self.count))
+
+        self.resize_pool()
+
+    def set_rows(self, count: int, row_values: Callable[[int], Sequence], keep_position: bool = False):
+        """
+        Shows a new list of count rows; row_values(position) gives a row's
+        column values. Goes back to the top unless keep_position is set.
+        """
+        self.count = count
+        self.row_values = row_values
+        if not keep_position:
+            self.offset = 0
+            self.selected = None
+        elif self.selected is not None and self.selected >= count:
+            self.selected = None
+        self.render()
+
+    def selected_position(self) -> Optional[int]:
+        """Position of the selected row in the list, or None."""
+        return self.selected
+
+    def max_offset(self) -> int:
+        return max(0, self.count - self.visible)
+
+    def scroll_to(self, offset: int):
+        """Makes offset the first visible position (clamped to the list)."""
+        offset = max(0, min(int(offset), self.max_offset()))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def scroll(self, rows: int) -> str:
+        self.scroll_to(self.offset + rows)
+        # Stop the tree from scrolling its own rows as well
+        return 'break'
+
+    def see(self, position: int):
+        """Scrolls just enough to bring a position into view."""
+        if position < self.offset:
+            self.scroll_to(position)
+        elif position >= self.offset + self.visible:
+            self.scroll_to(position - self.visible + 1)
+
+    def yview(self, *args):
+        """Scrollbar command: ('moveto', fraction) or ('scroll', n, 'units'/'pages')."""
+        if not args:
+            return
+        if args[0] == 'moveto':
+            self.scroll_to(round(float(args[1]) * self.count))
+        elif args[0] == 'scroll':
+            step = self.visible if args[2] == 'pages' else 1
+            self.scroll(int(args[1]) * step)
+
+    def on_mouse_wheel(self, event) -> str:
+        # Windows reports multiples of 120 per notch, macOS small deltas
+        notches = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self.scroll(-3 * notches)
+
+    def move_selection(self, rows: int) -> str:
+        """Keyboard navigation: moves the selection and scrolls to keep it visible."""
+        if self.count == 0:
+            return 'break'
+        start = self.selected if self.selected is not None else self.offset - (1 if rows > 0 else 0)
+        position = max(0, min(start + rows, self.count - 1))
+        self.see(position)
+        self.select(position)
+        return 'break'
+
+    def select(self, position: int):
+        if position != self.selected:
+            self.selected = position
+            self.render()
+            if self.on_select:
+                self.on_select(position)
+
+    def on_tree_select(self, event):
+        # Also fires for the selection render() sets; that maps back to
+        # self.selected, so select() ignores it
+        selection = self.tree.selection()
+        if not selection or selection[0] not in self.pool:
+            return
+        position = self.offset + self.pool.index(selection[0])
+        if position < self.count:
+            self.select(position)
+
+    def on_resize(self, event):
+        """Re-measures how many rows fit and grows the pool if needed."""
+        self.measure()
+        self.resize_pool()
+        # Keep the offset valid now that more or fewer rows fit
+        self.offset = min(self.offset, self.max_offset())
+        self.render()
+
+    def measure(self):
+        if not self.attached:
+            return
+        bbox = self.tree.bbox(self.pool[0])
+        if not bbox:
+            return
+        # bbox is (x, y, width, height); y is below the headings
+        _, heading_height, _, row_height = bbox
+        if row_height > 0:
+            self.visible = max(1, (self.tree.winfo_height() - heading_height) // row_height)
+
+    def resize_pool(self):
+        """Creates tree rows until there are enough for the viewport plus overscan."""
+        while len(self.pool) < self.visible + self.overscan:
+            iid = f'row{len(self.pool)}'
+            self.tree.insert('', 'end', iid=iid)
+            self.tree.detach(iid)
+            self.pool.append(iid)
+
+    def render(self):
+        """Writes the visible positions into the pool rows and updates the scrollbar."""
+        needed = min(len(self.pool), max(0, self.count - self.offset))
+
+        # Attach or detach pool rows so exactly the needed ones are in the tree
+        for i in range(self.attached, needed):
+            self.tree.move(self.pool[i], '', i)
+        if needed < self.attached:
+            self.tree.detach(*self.pool[needed:self.attached])
+        self.attached = needed
+
+        for i in range(needed):
+            self.tree.item(self.pool[i], values=tuple(self.row_values(self.offset + i)))
+
+        # Highlight the selected position only while it's in view
+        if self.selected is not None and self.offset <= self.selected < self.offset + needed:
+            self.tree.selection_set(self.pool[self.selected - self.offset])
+        elif self.tree.selection():
+            self.tree.selection_set(())
+        # The tree itself never scrolls; its first row is always the offset
+        self.tree.yview_moveto(0)
+
+        if self.count:
+            self.scrollbar.set(self.offset / self.count,
+                               min(1.0, (self.offset + self.visible) / self.count))
+        else:
+            self.scrollbar.set(0.0, 1.0)